@@ -1,10 +1,11 @@
+import asyncio
 from logging.config import fileConfig
 
 from alembic import context
+from sqlalchemy.engine import Connection
 
-from app.database import DB_URL
+from app.database import get_settings, get_engine
 from app.migration.models import Base
-from app.database import engine
 
 
 # Настройка логирования
@@ -20,7 +21,7 @@ def run_migrations_offline() -> None:
     """Запускает оффлайн миграции."""
 
     context.configure(
-        url=DB_URL,
+        url=get_settings()["db_url"],
         target_metadata=target_metadata,
         literal_binds=True,
     )
@@ -29,17 +30,32 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def do_run_migrations(connection: Connection) -> None:
+    """Выполняет миграции на синхронном подключении."""
+
+    context.configure(
+        connection=connection, 
+        target_metadata=target_metadata
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Запускает миграции через асинхронный движок."""
+
+    engine = get_engine()
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await engine.dispose()
+
+
 def run_migrations_online() -> None:
     """Запускает онлайн миграции."""
 
-    with engine.connect() as connection:
-        context.configure(
-            connection=connection, 
-            target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    asyncio.run(run_async_migrations())
 
 
 if context.is_offline_mode():
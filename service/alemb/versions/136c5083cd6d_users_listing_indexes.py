@@ -0,0 +1,35 @@
+"""Users listing indexes
+
+Revision ID: 136c5083cd6d
+Revises: cfe7f1fd85ac
+Create Date: 2026-10-18 10:12:41.527310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '136c5083cd6d'
+down_revision: Union[str, Sequence[str], None] = 'cfe7f1fd85ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_role_id', 'users', ['role', 'id'])
+    op.create_index('ix_users_is_active_id', 'users', ['is_active', 'id'])
+    op.create_index(
+        'ix_users_role_is_active_id', 
+        'users', 
+        ['role', 'is_active', 'id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_role_is_active_id', table_name='users')
+    op.drop_index('ix_users_is_active_id', table_name='users')
+    op.drop_index('ix_users_role_id', table_name='users')
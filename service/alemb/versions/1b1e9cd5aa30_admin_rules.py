@@ -0,0 +1,45 @@
+"""Admin rules
+
+Revision ID: 1b1e9cd5aa30
+Revises: 457608d4ecac
+Create Date: 2026-10-18 12:20:05.613998
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b1e9cd5aa30'
+down_revision: Union[str, Sequence[str], None] = '457608d4ecac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    rules = op.create_table('admin_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    version = op.create_table('admin_rules_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.bulk_insert(rules, [
+        {'text': 'Все пользователи должны иметь уникальный логин.'},
+        {'text': 'Пароль должен быть минимум 8 символов.'},
+        {'text': 'Доступ к админ-панели только для администраторов.'}
+    ])
+    op.bulk_insert(version, [{'id': 1, 'version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('admin_rules_version')
+    op.drop_table('admin_rules')
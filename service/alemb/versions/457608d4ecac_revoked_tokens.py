@@ -0,0 +1,43 @@
+"""Revoked tokens
+
+Revision ID: 457608d4ecac
+Revises: 136c5083cd6d
+Create Date: 2026-10-18 11:02:17.804215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '457608d4ecac'
+down_revision: Union[str, Sequence[str], None] = '136c5083cd6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revoked_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti')
+    )
+    op.create_index(
+        op.f('ix_revoked_tokens_expires_at'), 
+        'revoked_tokens', 
+        ['expires_at']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f('ix_revoked_tokens_expires_at'), 
+        table_name='revoked_tokens'
+    )
+    op.drop_table('revoked_tokens')
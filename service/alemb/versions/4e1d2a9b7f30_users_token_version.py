@@ -0,0 +1,36 @@
+"""Users token version
+
+Revision ID: 4e1d2a9b7f30
+Revises: 7c9873072487
+Create Date: 2026-10-18 15:21:09.834512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1d2a9b7f30'
+down_revision: Union[str, Sequence[str], None] = '7c9873072487'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users', 
+        sa.Column(
+            'token_version', 
+            sa.Integer(), 
+            server_default='0', 
+            nullable=False
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
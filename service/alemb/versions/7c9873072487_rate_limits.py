@@ -0,0 +1,44 @@
+"""Rate limits
+
+Revision ID: 7c9873072487
+Revises: 1b1e9cd5aa30
+Create Date: 2026-10-18 13:05:44.190327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c9873072487'
+down_revision: Union[str, Sequence[str], None] = '1b1e9cd5aa30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('window_start', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key', 'window_start')
+    )
+    op.create_index(
+        op.f('ix_rate_limits_window_start'), 
+        'rate_limits', 
+        ['window_start']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f('ix_rate_limits_window_start'), 
+        table_name='rate_limits'
+    )
+    op.drop_table('rate_limits')
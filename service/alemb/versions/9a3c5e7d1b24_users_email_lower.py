@@ -0,0 +1,62 @@
+"""Users email lower index
+
+Revision ID: 9a3c5e7d1b24
+Revises: 4e1d2a9b7f30
+Create Date: 2026-10-18 17:04:52.193876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a3c5e7d1b24'
+down_revision: Union[str, Sequence[str], None] = '4e1d2a9b7f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Из почт, которые отличаются только регистром, остается одна:
+    # активного пользователя, а среди них - самого раннего. Остальные
+    # пользователи деактивируются, а к их почте добавляется префикс
+    # duplicate-<id>-, чтобы она не нарушала уникальный индекс
+    op.execute(sa.text(
+        """
+        UPDATE users
+        SET is_active = false,
+            token_version = token_version + 1,
+            email = 'duplicate-' || id || '-' || lower(email)
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY lower(email)
+                    ORDER BY is_active DESC, id
+                ) AS position
+                FROM users
+            ) AS ranked
+            WHERE position > 1
+        )
+        """
+    ))
+
+    # Почты хранятся в нижнем регистре
+    op.execute(sa.text(
+        "UPDATE users SET email = lower(email) WHERE email <> lower(email)"
+    ))
+
+    op.create_index(
+        'ix_users_email_lower',
+        'users',
+        [sa.text('lower(email)')],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Исходный регистр почт и объединенные дубликаты не восстанавливаются
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,45 @@
+"""Revoked tokens created at
+
+Revision ID: b5d8e2f4a617
+Revises: 9a3c5e7d1b24
+Create Date: 2026-10-18 19:12:33.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f4a617'
+down_revision: Union[str, Sequence[str], None] = '9a3c5e7d1b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'revoked_tokens', 
+        sa.Column(
+            'created_at', 
+            sa.Integer(), 
+            server_default='0', 
+            nullable=False
+        )
+    )
+    op.create_index(
+        op.f('ix_revoked_tokens_created_at'), 
+        'revoked_tokens', 
+        ['created_at']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f('ix_revoked_tokens_created_at'), 
+        table_name='revoked_tokens'
+    )
+    op.drop_column('revoked_tokens', 'created_at')
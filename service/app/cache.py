@@ -0,0 +1,291 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from database import get_settings, LazyObject
+from metrics import lookup_calls
+
+
+class TTLCache():
+    """
+    Ограниченный по размеру кэш с вытеснением LRU и временем жизни записей.
+
+    Записи старше ttl секунд считаются отсутствующими. При переполнении
+    удаляется запись, к которой дольше всего не обращались.
+
+    Каждое удаление записи увеличивает номер поколения кэша. Значение,
+    прочитанное из базы до удаления, не сохраняется, если при set
+    передать поколение, взятое до чтения: иначе оно вернуло бы в кэш
+    устаревшие данные.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Поколение последнего удаления по ключу. Хранится не больше
+        # maxsize ключей, для забытых ключей используется _floor -
+        # наибольшее поколение среди забытых
+        self.generation = 0
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._floor = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Получает значение из кэша.
+
+        Args:
+            key: ключ записи.
+
+        Returns:
+            Значение или None, если записи нет или она устарела.
+        """
+
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at <= monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self, 
+        key: Hashable, 
+        value: Any, 
+        ttl: float | None = None,
+        since: int | None = None
+    ) -> None:
+        """
+        Сохраняет значение в кэш.
+
+        Args:
+            key: ключ записи.
+            value: значение.
+            ttl: время жизни записи в секундах. По умолчанию - self.ttl.
+            since: поколение кэша (self.generation) до чтения значения.
+                   Если запись удалили позже, то значение не сохраняется.
+        """
+
+        if self.maxsize <= 0:
+            return
+        if since is not None:
+            invalidated = self._invalidated.get(key, self._floor)
+            if invalidated > since:
+                return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (monotonic() + ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаляет запись из кэша.
+
+        Args:
+            key: ключ записи.
+        """
+
+        self._data.pop(key, None)
+        self._mark_invalidated(key)
+
+    def invalidate_many(self, keys: Iterable[Hashable]) -> None:
+        """
+        Удаляет записи из кэша.
+
+        Args:
+            keys: ключи записей.
+        """
+
+        for key in keys:
+            self._data.pop(key, None)
+            self._mark_invalidated(key)
+
+    def clear(self) -> None:
+        """Очищает кэш."""
+
+        self._data.clear()
+        self.generation += 1
+        self._invalidated.clear()
+        self._floor = self.generation
+
+    def _mark_invalidated(self, key: Hashable) -> None:
+        """Запоминает поколение удаления записи."""
+
+        self.generation += 1
+        self._invalidated[key] = self.generation
+        self._invalidated.move_to_end(key)
+
+        while len(self._invalidated) > max(self.maxsize, 1):
+            _, generation = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def stats(self) -> dict:
+        """
+        Выводит статистику кэша.
+
+        Returns:
+            Словарь с размером кэша и счетчиками попаданий, промахов и
+            вытеснений.
+        """
+
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class SingleFlight():
+    """
+    Объединяет одновременные одинаковые запросы в один.
+
+    Первый вызов с ключом выполняет запрос. Вызовы с тем же ключом,
+    пришедшие до его завершения, не обращаются к базе данных, а ждут
+    и получают тот же результат или то же исключение. После завершения
+    запроса ключ освобождается, результат не кэшируется.
+
+    Запрос можно пометить тегом (например, почтой пользователя). После
+    записи метод forget отвязывает идущие запросы с этим тегом: новые
+    вызовы не присоединяются к запросу, начатому до записи.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(
+        self, 
+        key: Hashable, 
+        fetch: Callable[[], Awaitable[Any]],
+        tag: Hashable | None = None
+    ) -> Any:
+        """
+        Выполняет запрос или присоединяется к уже идущему.
+
+        Запрос выполняется в отдельной задаче, поэтому отмена одного
+        из ожидающих вызовов не отменяет его для остальных.
+
+        Args:
+            key: ключ запроса. Если он не хэшируемый, то запрос
+                 выполняется без объединения.
+            fetch: функция без аргументов, которая выполняет запрос.
+            tag: тег запроса для forget.
+
+        Returns:
+            Результат запроса.
+        """
+
+        try:
+            flight = self._flights.get(key) if self.enabled else None
+        except TypeError:
+            return await fetch()
+
+        if flight is not None:
+            self.coalesced += 1
+            lookup_calls.inc("coalesced")
+            return await asyncio.shield(flight)
+
+        self.calls += 1
+        lookup_calls.inc("executed")
+        if not self.enabled:
+            return await fetch()
+
+        flight = asyncio.ensure_future(fetch())
+        self._flights[key] = flight
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        flight.add_done_callback(lambda _: self._land(key, flight, tag))
+
+        return await asyncio.shield(flight)
+
+    def forget(self, tag: Hashable) -> None:
+        """
+        Отвязывает идущие запросы с тегом от их ключей.
+
+        Уже ожидающие вызовы получат результат этих запросов, а новые
+        вызовы выполнят запрос заново.
+
+        Args:
+            tag: тег запросов.
+        """
+
+        for key in self._tags.pop(tag, ()):
+            self._flights.pop(key, None)
+
+    def _land(
+        self, 
+        key: Hashable, 
+        flight: asyncio.Future, 
+        tag: Hashable | None
+    ) -> None:
+        """Освобождает ключ завершенного запроса."""
+
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+        # Исключение считается полученным, даже если все вызовы отменены
+        if not flight.cancelled():
+            flight.exception()
+
+    def stats(self) -> dict:
+        """
+        Выводит статистику объединения запросов.
+
+        Returns:
+            Словарь с числом идущих запросов, выполненных запросов и
+            вызовов, которые присоединились к уже идущему запросу.
+        """
+
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+
+# Пользователи, прошедшие авторизацию в require_role, по email
+principal_cache = LazyObject(
+    lambda: TTLCache(**get_settings()["cache"]["principal"])
+)
+
+# Данные уже проверенных токенов по sha256 от токена
+token_cache = LazyObject(
+    lambda: TTLCache(**get_settings()["cache"]["token"])
+)
+
+# Поиски в базе данных, которые сейчас выполняются, по запросу и параметрам
+lookup_flight = LazyObject(
+    lambda: SingleFlight(**get_settings()["cache"]["singleflight"])
+)
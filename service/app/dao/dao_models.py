@@ -1,28 +1,87 @@
-from sqlalchemy import select, delete, insert, update
+from sqlalchemy import select, delete, insert, update, and_, literal_column
+from sqlalchemy import case, exists, func, bindparam, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.sql import ClauseElement
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ClauseElement, Executable
 from pydantic import EmailStr
 
-from typing import TypeVar, Type, Generic
+from time import time
+from typing import TypeVar, Type, Generic, AsyncIterator, NamedTuple
+from typing import Awaitable, Callable, Hashable, Iterable
 
-from database import session_maker
-from migration.models import Users
+from database import session_maker, read_session, write_session
+from database import reads_from_primary
+from cache import principal_cache, lookup_flight
+from migration.models import Users, RevokedTokens, Rules, RulesVersion
+from migration.models import RateLimits
 
 
 T = TypeVar("T")
 
 
+def _dialect_insert(session: AsyncSession):
+    """Выбирает insert с поддержкой ON CONFLICT для диалекта сессии."""
+
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+class Principal():
+    """
+    Данные пользователя, нужные для проверки роли.
+
+    Хранится в кэше авторизованных пользователей вместо ORM-объекта.
+    """
+
+    __slots__ = ("email", "id", "role", "token_version")
+
+    def __init__(
+        self, 
+        email: str, 
+        id: int, 
+        role: str, 
+        token_version: int
+    ) -> None:
+        self.email = email
+        self.id = id
+        self.role = role
+        self.token_version = token_version
+
+
+class Credentials(NamedTuple):
+    """Данные пользователя, нужные для проверки пароля и выдачи токенов."""
+
+    password: str
+    is_active: bool
+    id: int
+    role: str
+    token_version: int
+
+
 class BaseDAO(Generic[T]):
-    """Базовый класс взаимодействия с данными."""
+    """
+    Базовый класс взаимодействия с данными.
+
+    Чтения идут в реплики (если они настроены), записи - в основную базу.
+    """
 
     model: Type[T]
         
     @classmethod
-    def _add_data(cls, **values) -> bool:
+    async def _add_data(
+        cls, 
+        lock_key: int | None = None, 
+        **values
+    ) -> bool:
         """
         Добавляет данные в базу данных.
 
         Args:
+            lock_key: ключ advisory-блокировки Postgres, которая берется
+                      перед запросом и держится до конца транзакции.
             values: словарь с данными для добавления.
 
                     Ключи должны соответствовать атрибутам ORM-модели.
@@ -35,37 +94,206 @@ class BaseDAO(Generic[T]):
             SQLAlchemyError - если возникла ошибка при удалении.
         """
 
-        with session_maker() as session:
+        async with write_session() as session:
+            dialect = session.bind.dialect.name
+
+            if lock_key is not None and dialect == "postgresql":
+                await session.execute(
+                    select(func.pg_advisory_xact_lock(lock_key))
+                )
+
             query = insert(cls.model).values(**values)
-            session.execute(query)
+            await session.execute(query)
             try:
-                session.commit()
+                await session.commit()
             except SQLAlchemyError as error:
-                session.rollback()
+                await session.rollback()
                 raise error
             else:
                 return True
             
+    @staticmethod
+    async def _coalesce(
+        key: tuple, 
+        fetch: Callable[[], Awaitable], 
+        tag: Hashable | None = None
+    ):
+        """
+        Выполняет чтение, объединяя его с таким же уже идущим чтением.
+
+        Чтения из основной базы (после записи клиента) и из реплик
+        не объединяются между собой.
+
+        Args:
+            key: запрос и значения его параметров.
+            fetch: функция без аргументов, которая выполняет чтение.
+            tag: тег чтения. Запись, которая меняет эти данные, вызывает
+                 lookup_flight.forget(tag).
+
+        Returns:
+            Результат чтения. Одновременные вызовы получают один и тот же
+            объект, поэтому менять его нельзя.
+        """
+
+        return await lookup_flight.run(
+            (reads_from_primary(), *key), 
+            fetch, 
+            tag=tag
+        )
+
+    @classmethod
+    async def _find_prepared(
+        cls, 
+        statement: Executable, 
+        primary: bool = False,
+        tag: Hashable | None = None,
+        **params
+    ) -> Row | None:
+        """
+        Выполняет заранее построенный SELECT с параметрами.
+
+        Запрос строится один раз, поэтому SQLAlchemy не собирает его
+        заново при каждом вызове и сразу берет скомпилированный SQL
+        из кэша. Одновременные вызовы с одинаковыми параметрами
+        выполняются одним запросом к базе данных.
+
+        Args:
+            statement: запрос с параметрами bindparam.
+            primary: читать из основной базы, даже если есть реплики.
+            tag: тег чтения для lookup_flight.forget.
+            params: значения параметров.
+
+        Returns:
+            Первая строка результата или None, если она не найдена.
+        """
+
+        async def fetch() -> Row | None:
+            open_session = session_maker if primary else read_session
+            async with open_session() as session:
+                result = await session.execute(statement, params)
+
+                return result.first()
+
+        key = (primary, statement, tuple(sorted(params.items())))
+        return await cls._coalesce(key, fetch, tag=tag)
+
+    @classmethod
+    async def _execute_prepared(cls, statement: Executable, **params) -> bool:
+        """
+        Выполняет заранее построенный UPDATE или DELETE с параметрами.
+
+        Args:
+            statement: запрос с параметрами bindparam.
+            params: значения параметров.
+
+        Returns:
+            True - если функция завершилась без ошибок.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при выполнении.
+        """
+
+        async with write_session() as session:
+            try:
+                await session.execute(statement, params)
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return True
+
     @classmethod
-    def _find_where(cls, *conditions: ClauseElement) -> T | None:
+    async def _update_prepared(
+        cls, 
+        statement: Executable, 
+        **params
+    ) -> Row | None:
         """
-        Находит данные по условию.
+        Выполняет заранее построенный UPDATE ... RETURNING с параметрами.
+
+        Args:
+            statement: запрос с параметрами bindparam и RETURNING.
+            params: значения параметров.
+
+        Returns:
+            Первая измененная строка или None, если ничего не изменилось.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при выполнении.
+        """
+
+        async with write_session() as session:
+            try:
+                result = await session.execute(statement, params)
+                row = result.first()
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return row
+
+    @classmethod
+    async def _find_all_where(
+        cls, 
+        *conditions: ClauseElement, 
+        order_by: ClauseElement | None = None
+    ) -> list[T]:
+        """
+        Находит все данные по условию.
 
         Args:
             conditions: набор условий.
-        
+            order_by: порядок сортировки.
+
         Returns:
-            Объект или None, если он не найден.
+            Список объектов.
         """
 
-        with session_maker() as session:
+        async with read_session() as session:
             query = select(cls.model).where(*conditions)
-            result = session.execute(query)
-            
-            return result.scalars().first()
+            if order_by is not None:
+                query = query.order_by(order_by)
+            result = await session.execute(query)
+
+            return list(result.scalars().all())
+
+    @classmethod
+    async def _execute_in_transaction(cls, *queries) -> list:
+        """
+        Выполняет несколько запросов в одной транзакции.
+
+        Args:
+            queries: запросы в порядке выполнения.
+
+        Returns:
+            Список результатов: строки для запросов с RETURNING,
+            иначе число затронутых строк.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка, все запросы
+            отменяются.
+        """
+
+        async with write_session() as session:
+            try:
+                results = []
+                for query in queries:
+                    result = await session.execute(query)
+                    results.append(
+                        result.all() if result.returns_rows 
+                        else result.rowcount
+                    )
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return results
         
     @classmethod
-    def _delete_where(cls, *conditions: ClauseElement) -> bool:
+    async def _delete_where(cls, *conditions: ClauseElement) -> bool:
         """
         Удаляет данные из базы данных.
 
@@ -79,19 +307,19 @@ class BaseDAO(Generic[T]):
             SQLAlchemyError - если возникла ошибка при удалении.
         """
 
-        with session_maker() as session:
+        async with write_session() as session:
             query = delete(cls.model).where(*conditions)
-            session.execute(query)
+            await session.execute(query)
             try:
-                session.commit()
+                await session.commit()
             except SQLAlchemyError as error:
-                session.rollback()
+                await session.rollback()
                 raise error
             else:
                 return True
             
     @classmethod        
-    def _update_data(cls, *conditions: ClauseElement, **values) -> bool:
+    async def _update_data(cls, *conditions: ClauseElement, **values) -> bool:
         """
         Обновляет данные в базе данных.
 
@@ -106,26 +334,495 @@ class BaseDAO(Generic[T]):
             SQLAlchemyError - если возникла ошибка при обновлении.
         """
 
-        with session_maker() as session:
+        async with write_session() as session:
             query = update(cls.model).where(*conditions).values(**values)
-            session.execute(query)
+            await session.execute(query)
             try:
-                session.commit()
+                await session.commit()
             except SQLAlchemyError as error:
-                session.rollback()
+                await session.rollback()
                 raise error
             else:
                 return True
 
 
+    @classmethod
+    async def _update_returning(
+        cls, 
+        *conditions: ClauseElement, 
+        returning: tuple[str, ...], 
+        **values
+    ) -> list[Row]:
+        """
+        Обновляет данные одним запросом и возвращает измененные строки.
+
+        Args:
+            conditions: набор условий.
+            returning: поля измененных строк, которые нужно вернуть.
+            values: словарь с полями и значениями для обновления.
+
+        Returns:
+            Список строк с полями returning.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при обновлении.
+        """
+
+        async with write_session() as session:
+            query = (
+                update(cls.model)
+                .where(*conditions)
+                .values(**values)
+                .returning(*(getattr(cls.model, field) for field in returning))
+                .execution_options(synchronize_session=False)
+            )
+            try:
+                result = await session.execute(query)
+                rows = result.all()
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return rows
+
+    @classmethod
+    async def _update_chunked(
+        cls, 
+        *conditions: ClauseElement, 
+        chunk_size: int, 
+        returning: tuple[str, ...], 
+        **values
+    ) -> list[Row]:
+        """
+        Обновляет все подходящие записи частями по chunk_size.
+
+        Каждая часть - один UPDATE ... WHERE id IN (SELECT id ... LIMIT)
+        в своей транзакции, поэтому блокировки держатся недолго. Части
+        идут по возрастанию id, так что запись, которая после обновления
+        все еще подходит под условия, не обновляется второй раз.
+
+        Args:
+            conditions: набор условий.
+            chunk_size: число записей в одной транзакции.
+            returning: поля измененных строк, которые нужно вернуть.
+            values: словарь с полями и значениями для обновления.
+
+        Returns:
+            Список строк с полем id и полями returning.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при обновлении. Части,
+            обновленные до ошибки, остаются сохраненными.
+        """
+
+        returning = ("id", *(field for field in returning if field != "id"))
+
+        rows = []
+        after_id = None
+        while True:
+            chunk_conditions = conditions
+            if after_id is not None:
+                chunk_conditions = (*conditions, cls.model.id > after_id)
+
+            ids = (
+                select(cls.model.id)
+                .where(*chunk_conditions)
+                .order_by(cls.model.id)
+                .limit(chunk_size)
+                .scalar_subquery()
+            )
+            chunk = await cls._update_returning(
+                cls.model.id.in_(ids), 
+                returning=returning, 
+                **values
+            )
+            rows.extend(chunk)
+
+            if len(chunk) < chunk_size:
+                return rows
+            after_id = max(row.id for row in chunk)
+
+    @classmethod
+    async def _upsert_data(
+        cls,
+        index_elements: list[str],
+        update_fields: list[str],
+        *conditions: ClauseElement,
+        lock_key: int | None = None,
+        **values
+    ) -> tuple[T | None, bool]:
+        """
+        Добавляет данные или обновляет существующие одним запросом.
+
+        Выполняет INSERT ... ON CONFLICT DO UPDATE ... RETURNING. Если
+        запись с такими index_elements уже есть и подходит под условия,
+        то обновляются поля update_fields. Если запись есть, но не
+        подходит под условия, то она не меняется.
+
+        Args:
+            index_elements: поля уникального ограничения.
+            update_fields: поля, которые обновляются при конфликте.
+            conditions: условия, при которых существующая запись
+                        обновляется.
+            lock_key: ключ advisory-блокировки Postgres, которая берется
+                      перед запросом и держится до конца транзакции.
+            values: словарь с данными для добавления. Значения могут
+                    быть SQL-выражениями.
+
+        Returns:
+            Кортеж (объект, создан ли он). Если существующая запись не
+            подошла под условия, то (None, False).
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        async with write_session() as session:
+            dialect = session.bind.dialect.name
+
+            if lock_key is not None and dialect == "postgresql":
+                await session.execute(
+                    select(func.pg_advisory_xact_lock(lock_key))
+                )
+
+            query = _dialect_insert(session)(cls.model).values(**values)
+            query = query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={
+                    field: query.excluded[field] for field in update_fields
+                },
+                where=and_(*conditions) if conditions else None
+            )
+
+            if dialect == "postgresql":
+                # xmax = 0 только у строк, созданных этим запросом
+                query = query.returning(
+                    cls.model, 
+                    literal_column("xmax = 0")
+                )
+            else:
+                query = query.returning(cls.model)
+                found = await session.execute(
+                    select(cls.model.id).where(*(
+                        getattr(cls.model, field) == values[field]
+                        for field in index_elements
+                    ))
+                )
+                created = found.first() is None
+
+            try:
+                result = (await session.execute(query)).first()
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+
+            if result is None:
+                return None, False
+            if dialect == "postgresql":
+                return result[0], result[1]
+            return result[0], created
+
+    @classmethod
+    async def _upsert_increment(
+        cls, 
+        index_elements: list[str], 
+        field: str, 
+        **values
+    ) -> int:
+        """
+        Добавляет запись или увеличивает счетчик существующей одним запросом.
+
+        Выполняет INSERT ... ON CONFLICT DO UPDATE SET field = field +
+        excluded.field ... RETURNING field.
+
+        Args:
+            index_elements: поля уникального ограничения.
+            field: поле-счетчик.
+            values: словарь с данными для добавления, включая начальное
+                    значение счетчика (оно же шаг увеличения).
+
+        Returns:
+            Значение счетчика после запроса.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        table = cls.model.__table__
+
+        # Служебный счетчик: запись не закрепляет чтения клиента за
+        # основной базой
+        async with session_maker() as session:
+            query = _dialect_insert(session)(table).values(**values)
+            query = query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={field: table.c[field] + query.excluded[field]}
+            ).returning(table.c[field])
+            try:
+                result = await session.execute(query)
+                value = result.scalar_one()
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return value
+
+    @classmethod
+    async def _bulk_add_data(
+        cls, 
+        rows: list[dict], 
+        index_elements: list[str]
+    ) -> list[tuple]:
+        """
+        Добавляет набор записей в базу данных одним запросом.
+
+        Записи, которые конфликтуют с уже существующими по index_elements,
+        пропускаются (ON CONFLICT DO NOTHING).
+
+        Args:
+            rows: список словарей с данными для добавления.
+            index_elements: поля уникального ограничения.
+
+        Returns:
+            Значения index_elements для добавленных записей.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        if not rows:
+            return []
+
+        table = cls.model.__table__
+        async with write_session() as session:
+            query = (
+                _dialect_insert(session)(table)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=index_elements)
+                .returning(*(table.c[field] for field in index_elements))
+            )
+            try:
+                result = await session.execute(query)
+                inserted = [tuple(row) for row in result.all()]
+                await session.commit()
+            except SQLAlchemyError as error:
+                await session.rollback()
+                raise error
+            else:
+                return inserted
+
+    @classmethod
+    async def _stream_where(
+        cls, 
+        *conditions: ClauseElement, 
+        chunk_size: int
+    ) -> AsyncIterator[list[T]]:
+        """
+        Построчно читает данные по условию частями.
+
+        Данные читаются через серверный курсор, поэтому в памяти
+        одновременно находится не больше chunk_size объектов.
+
+        Args:
+            conditions: набор условий.
+            chunk_size: размер одной части.
+
+        Yields:
+            Список объектов длиной не больше chunk_size.
+        """
+
+        async with read_session() as session:
+            query = (
+                select(cls.model)
+                .where(*conditions)
+                .execution_options(yield_per=chunk_size)
+            )
+            result = await session.stream_scalars(query)
+            async for chunk in result.partitions(chunk_size):
+                yield list(chunk)
+
+
+    @classmethod
+    async def _find_page(
+        cls, 
+        *conditions: ClauseElement, 
+        after_id: int | None, 
+        limit: int
+    ) -> list[T]:
+        """
+        Находит страницу данных по условию (keyset-пагинация).
+
+        Записи упорядочены по id. Следующая страница начинается после
+        последнего id предыдущей, поэтому стоимость запроса не зависит
+        от номера страницы, в отличие от OFFSET.
+
+        Args:
+            conditions: набор условий.
+            after_id: id последней записи предыдущей страницы.
+            limit: максимальное число записей на странице.
+
+        Returns:
+            Список объектов.
+        """
+
+        if after_id is not None:
+            conditions = (*conditions, cls.model.id > after_id)
+
+        async with read_session() as session:
+            query = (
+                select(cls.model)
+                .where(*conditions)
+                .order_by(cls.model.id)
+                .limit(limit)
+            )
+            result = await session.execute(query)
+
+            return list(result.scalars().all())
+
+
 class UsersDAO(BaseDAO[Users]):
     """Класс взаимодействия с данными таблицы users."""
 
     model = Users
-    _count_users = 0
+
+    # Ключ advisory-блокировки для выбора первого администратора
+    _bootstrap_lock_key = 0x61646D696E
+
+    # Пользователи не удаляются физически, поэтому, когда таблица
+    # стала непустой, она остается такой во всех процессах
+    _has_users = False
+
+    # Почта сравнивается без учета регистра. Выражение lower(email)
+    # совпадает с выражением индекса ix_users_email_lower, поэтому поиск
+    # идет по индексу
+    _email_key = func.lower(Users.email)
+
+    # Запросы фиксированной формы по email строятся один раз
+    _select_by_email = (
+        select(Users.__table__)
+        .where(_email_key == bindparam("email"))
+    )
+    _select_principal = (
+        select(Users.id, Users.role, Users.token_version, Users.is_active)
+        .where(_email_key == bindparam("email"))
+        .limit(1)
+    )
+    _select_credentials = (
+        select(
+            Users.password, 
+            Users.is_active, 
+            Users.id, 
+            Users.role, 
+            Users.token_version
+        )
+        .where(_email_key == bindparam("email"))
+        .limit(1)
+    )
+    _deactivate = (
+        update(Users)
+        .where(_email_key == bindparam("user_email"))
+        .values(is_active=False, token_version=Users.token_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    # UPDATE по email для каждого набора изменяемых полей
+    _update_statements: dict[tuple[frozenset[str], bool], Executable] = {}
 
     @classmethod
-    def add_user(
+    def _update_by_email(
+        cls, 
+        fields: frozenset[str], 
+        bump_version: bool
+    ) -> Executable:
+        """
+        Находит или строит UPDATE по email для набора полей.
+
+        Значения полей передаются параметрами new_<поле>, а email -
+        параметром user_email: в UPDATE имя параметра не может совпадать
+        с именем столбца. Строка меняется, только если хотя бы одно
+        значение отличается от сохраненного, и возвращается через
+        RETURNING.
+        """
+
+        statement = cls._update_statements.get((fields, bump_version))
+        if statement is None:
+            values = {field: bindparam(f"new_{field}") for field in fields}
+            if bump_version:
+                values["token_version"] = Users.token_version + 1
+
+            changed = or_(*(
+                getattr(Users, field).is_distinct_from(values[field])
+                for field in fields
+            ))
+            statement = (
+                update(Users)
+                .where(
+                    cls._email_key == bindparam("user_email"),
+                    Users.is_active.is_(True),
+                    changed
+                )
+                .values(values)
+                .returning(Users)
+                .execution_options(synchronize_session=False)
+            )
+            cls._update_statements[(fields, bump_version)] = statement
+        return statement
+
+    @staticmethod
+    def _forget(emails: Iterable[str]) -> None:
+        """
+        Сбрасывает данные пользователей после записи.
+
+        Пользователи удаляются из кэша авторизованных пользователей, а
+        идущие поиски по их почте отвязываются: вызовы после записи не
+        получат строку, прочитанную до нее.
+
+        Args:
+            emails: нормализованные почты измененных пользователей.
+        """
+
+        emails = list(emails)
+        principal_cache.invalidate_many(emails)
+        for email in emails:
+            lookup_flight.forget(email)
+
+    @staticmethod
+    def _normalize_email(email: str) -> str:
+        """
+        Приводит почту к виду, в котором она хранится в базе данных.
+
+        Args:
+            email: электронная почта.
+
+        Returns:
+            Почта без пробелов по краям в нижнем регистре.
+        """
+
+        return email.strip().lower()
+
+    @classmethod
+    def _role_expression(cls):
+        """
+        Формирует SQL-выражение роли нового пользователя.
+
+        Первый пользователь в таблице становится администратором.
+        Решение принимает база данных в том же запросе, что и вставка,
+        поэтому оно не зависит от числа процессов приложения.
+        """
+
+        if cls._has_users:
+            return "user"
+
+        return case(
+            (exists().where(cls.model.id.is_not(None)), "user"),
+            else_="admin"
+        )
+
+    @classmethod
+    async def add_user(
         cls, 
         name: str, 
         email: EmailStr, 
@@ -150,12 +847,15 @@ class UsersDAO(BaseDAO[Users]):
             SQLAlchemyError - если возникла ошибка при добавлении пользователя.
         """
 
-        # Первый пользователь является админом
-        role = "admin" if cls._count_users == 0 else "user"
+        # Первый пользователь является админом. Пока таблица пуста,
+        # регистрации выполняются по очереди под advisory-блокировкой
+        role = cls._role_expression()
+        lock_key = None if cls._has_users else cls._bootstrap_lock_key
 
-        result = super()._add_data(
+        result = await super()._add_data(
+            lock_key=lock_key,
             name=name, 
-            email=email, 
+            email=cls._normalize_email(email), 
             password=password,
             surname=surname,
             middle_name=middle_name,
@@ -164,12 +864,229 @@ class UsersDAO(BaseDAO[Users]):
         )
 
         if result:
-            cls._count_users += 1
+            cls._has_users = True
+            cls._forget([cls._normalize_email(email)])
 
         return result
+
+    @classmethod
+    async def upsert_user(
+        cls, 
+        name: str, 
+        email: EmailStr, 
+        password: str, 
+        surname: str, 
+        middle_name: str
+    ) -> tuple[Users | None, bool]:
+        """
+        Регистрирует пользователя одним запросом к базе данных.
+
+        Новый пользователь добавляется, а удаленный (is_active=False)
+        восстанавливается с новыми данными. Активный пользователь не
+        меняется.
+
+        Args:
+            name: имя пользователя.
+            email: электронная почта.
+            password: хэшированный пароль.
+            surname: фамилия пользователя.
+            middle_name: отчество пользователя.
+
+        Returns:
+            Кортеж (пользователь, создан ли он). Если пользователь с такой
+            почтой уже активен, то (None, False).
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при регистрации.
+        """
+
+        # Первый пользователь является админом. Пока таблица пуста,
+        # регистрации выполняются по очереди под advisory-блокировкой
+        role = cls._role_expression()
+        lock_key = None if cls._has_users else cls._bootstrap_lock_key
+        email = cls._normalize_email(email)
+
+        user, created = await super()._upsert_data(
+            ["email"],
+            ["name", "password", "surname", "middle_name", "is_active"],
+            cls.model.is_active.is_(False),
+            lock_key=lock_key,
+            name=name, 
+            email=email, 
+            password=password,
+            surname=surname,
+            middle_name=middle_name,
+            is_active=True,
+            role=role
+        )
+
+        cls._has_users = True
+        if user is not None:
+            cls._forget([email])
+
+        return user, created
     
     @classmethod
-    def find_user(cls, email: EmailStr) -> Users | bool:
+    async def add_users(cls, users: list[dict]) -> set[str]:
+        """
+        Добавляет набор пользователей в базу данных одним запросом.
+
+        Пользователи с уже занятой почтой пропускаются.
+
+        Args:
+            users: список словарей с полями name, email, password
+                   (хэшированный), surname и middle_name.
+
+        Returns:
+            Почты добавленных пользователей.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        rows = [
+            {
+                **user, 
+                "email": cls._normalize_email(user["email"]),
+                "is_active": True, 
+                "role": "user"
+            } 
+            for user in users
+        ]
+        inserted = await super()._bulk_add_data(rows, ["email"])
+        emails = {row[0] for row in inserted}
+        cls._forget(emails)
+
+        return emails
+
+    @classmethod
+    async def stream_users(cls, chunk_size: int) -> AsyncIterator[list[Users]]:
+        """
+        Читает всех пользователей частями.
+
+        Args:
+            chunk_size: размер одной части.
+
+        Yields:
+            Список пользователей длиной не больше chunk_size.
+        """
+
+        async for chunk in super()._stream_where(chunk_size=chunk_size):
+            yield chunk
+
+    @classmethod
+    async def bulk_update(
+        cls,
+        values: dict,
+        chunk_size: int,
+        emails: list[EmailStr] | None = None,
+        role: str | None = None,
+        is_active: bool | None = None,
+        email_domain: str | None = None
+    ) -> list[int]:
+        """
+        Обновляет сразу много пользователей.
+
+        Пользователи выбираются по списку почт или по фильтру. Обновление
+        идет частями по chunk_size, каждая часть - один запрос в своей
+        транзакции. Пользователи, у которых все значения уже совпадают,
+        не меняются. Измененные пользователи удаляются из кэша
+        авторизованных пользователей одним вызовом, а версия их токенов
+        увеличивается.
+
+        Args:
+            values: словарь с полями и значениями для обновления.
+            chunk_size: число пользователей в одной транзакции.
+            emails: список почт. Если задан, то фильтры применяются
+                    только к пользователям из списка.
+            role: фильтр по роли.
+            is_active: фильтр по активности.
+            email_domain: фильтр по домену почты.
+
+        Returns:
+            Список id измененных пользователей.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при обновлении.
+        """
+
+        # Строки, в которых все значения уже совпадают, не меняются: иначе
+        # выросла бы версия токенов и пользователь попал бы в результат
+        conditions = [or_(*(
+            getattr(cls.model, field).is_distinct_from(value)
+            for field, value in values.items()
+        ))]
+        values = {**values, "token_version": cls.model.token_version + 1}
+
+        if role is not None:
+            conditions.append(cls.model.role == role)
+        if is_active is not None:
+            conditions.append(cls.model.is_active.is_(is_active))
+        if email_domain is not None:
+            domain = email_domain.strip().lower()
+            conditions.append(
+                cls.model.email.endswith(f"@{domain}", autoescape=True)
+            )
+
+        rows = []
+        try:
+            if emails is None:
+                rows = await super()._update_chunked(
+                    *conditions,
+                    chunk_size=chunk_size,
+                    returning=("id", "email"),
+                    **values
+                )
+            else:
+                emails = list(dict.fromkeys(map(cls._normalize_email, emails)))
+                for start in range(0, len(emails), chunk_size):
+                    chunk = emails[start:start + chunk_size]
+                    rows.extend(await super()._update_returning(
+                        cls._email_key.in_(chunk),
+                        *conditions,
+                        returning=("id", "email"),
+                        **values
+                    ))
+        finally:
+            cls._forget(row.email for row in rows)
+
+        return [row.id for row in rows]
+
+    @classmethod
+    async def list_users(
+        cls,
+        after_id: int | None,
+        limit: int,
+        role: str | None = None,
+        is_active: bool | None = None
+    ) -> list[Users]:
+        """
+        Находит страницу пользователей, упорядоченных по id.
+
+        Args:
+            after_id: id последнего пользователя предыдущей страницы.
+            limit: максимальное число пользователей на странице.
+            role: фильтр по роли.
+            is_active: фильтр по активности.
+
+        Returns:
+            Список пользователей.
+        """
+
+        conditions = []
+        if role is not None:
+            conditions.append(cls.model.role == role)
+        if is_active is not None:
+            conditions.append(cls.model.is_active.is_(is_active))
+
+        return await super()._find_page(
+            *conditions, 
+            after_id=after_id, 
+            limit=limit
+        )
+
+    @classmethod
+    async def find_user(cls, email: EmailStr) -> Users | bool:
         """
         Находит пользователя в базе данных.
         
@@ -182,7 +1099,15 @@ class UsersDAO(BaseDAO[Users]):
             False - если не найден.
         """
 
-        user = super()._find_where(cls.model.email == email)
+        email = cls._normalize_email(email)
+        row = await super()._find_prepared(
+            cls._select_by_email, 
+            tag=email,
+            email=email
+        )
+
+        # Строка общая для одновременных вызовов, а объект у каждого свой
+        user = Users(**row._mapping) if row is not None else None
 
         if user:
             if not user.is_active:
@@ -192,9 +1117,71 @@ class UsersDAO(BaseDAO[Users]):
         return False
 
     @classmethod
-    def delete_user(cls, email: EmailStr) -> bool:
+    async def find_principal(cls, email: EmailStr) -> Principal | bool:
+        """
+        Находит роль и версию токенов пользователя.
+
+        Читает из основной базы: по результату проверяется доступ, и
+        отставшая реплика вернула бы роль или активность пользователя
+        до изменения админом.
+
+        Args:
+            email: электронная почта.
+
+        Returns:
+            Principal - если пользователь найден.
+            True - если пользователь найден, но не активный.
+            False - если не найден.
+        """
+
+        email = cls._normalize_email(email)
+        row = await super()._find_prepared(
+            cls._select_principal, 
+            primary=True,
+            tag=email,
+            email=email
+        )
+
+        if row is None:
+            return False
+        if not row.is_active:
+            return True
+        return Principal(email, row.id, row.role, row.token_version)
+
+    @classmethod
+    async def find_credentials(cls, email: EmailStr) -> Credentials | bool:
+        """
+        Находит хэш пароля пользователя для входа.
+
+        Args:
+            email: электронная почта.
+
+        Returns:
+            Credentials - если пользователь найден.
+            True - если пользователь найден, но не активный.
+            False - если не найден.
+        """
+
+        email = cls._normalize_email(email)
+        row = await super()._find_prepared(
+            cls._select_credentials, 
+            tag=email,
+            email=email
+        )
+
+        if row is None:
+            return False
+        if not row.is_active:
+            return True
+        return Credentials(*row)
+
+    @classmethod
+    async def delete_user(cls, email: EmailStr) -> bool:
         """
         Удаляет данные пользователя из базы данных.
+
+        Пользователь сразу удаляется из кэша авторизованных пользователей,
+        а версия его токенов увеличивается.
         
         Args:
             email: электронная почта.
@@ -206,26 +1193,288 @@ class UsersDAO(BaseDAO[Users]):
             SQLAlchemyError - если возникла ошибка при удалении пользователя.
         """
 
-        return super()._update_data(cls.model.email == email, is_active=False)
+        email = cls._normalize_email(email)
+        result = await super()._execute_prepared(
+            cls._deactivate, 
+            user_email=email
+        )
+        cls._forget([email])
+
+        return result
     
     @classmethod
-    def update_user(cls, email: EmailStr, **values) -> bool:
+    async def update_user(
+        cls, 
+        email: EmailStr, 
+        bump_version: bool = True, 
+        **values
+    ) -> Users | None:
         """
-        Обновляет данные пользователя в базе данных.
+        Обновляет данные активного пользователя в базе данных.
+
+        Если все значения совпадают с сохраненными, то строка не
+        меняется, а версия токенов не увеличивается. Измененный
+        пользователь сразу удаляется из кэша авторизованных пользователей.
 
         Args: 
             email: электронная почта.
+            bump_version: увеличить версию токенов, чтобы выданные раньше
+                          токены обновления перестали действовать.
             values: словарь с полями, которые нужно поменять.
 
         Returns:
-            True - если функция завершилась без ошибок.
+            Измененный пользователь или None, если данные не изменились
+            или активный пользователь не найден.
         
         Raises:
             SQLAlchemyError - если возникла ошибка во время обновления данных.
         """
 
-        return super()._update_data(
-            cls.model.email == email, 
-            **values, 
-            is_active=True
-        )
\ No newline at end of file
+        values.pop("is_active", None)
+        if not values:
+            return None
+
+        email = cls._normalize_email(email)
+        statement = cls._update_by_email(frozenset(values), bump_version)
+        row = await super()._update_prepared(
+            statement,
+            user_email=email,
+            **{f"new_{field}": value for field, value in values.items()}
+        )
+        if row is None:
+            return None
+
+        cls._forget([email])
+        return row[0]
+
+
+class RevokedTokensDAO(BaseDAO[RevokedTokens]):
+    """Класс взаимодействия с данными таблицы revoked_tokens."""
+
+    model = RevokedTokens
+
+    @classmethod
+    async def add_token(cls, jti: str, expires_at: int) -> bool:
+        """
+        Добавляет отозванный токен в базу данных.
+
+        Args:
+            jti: идентификатор токена.
+            expires_at: время истечения токена (unix-время).
+
+        Returns:
+            True - если функция завершилась без ошибок.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        return await super()._add_data(
+            jti=jti, 
+            expires_at=expires_at,
+            created_at=int(time())
+        )
+
+    @classmethod
+    async def claim_token(cls, jti: str, expires_at: int) -> bool:
+        """
+        Добавляет отозванный токен, если его еще нет.
+
+        Проверка и вставка выполняются одним запросом (ON CONFLICT DO
+        NOTHING), поэтому из одновременных вызовов с одним jti успешен
+        только один.
+
+        Args:
+            jti: идентификатор токена.
+            expires_at: время истечения токена (unix-время).
+
+        Returns:
+            True - если токен добавлен этим вызовом, False - если он уже
+            был отозван.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        row = {"jti": jti, "expires_at": expires_at, "created_at": int(time())}
+        inserted = await super()._bulk_add_data([row], ["jti"])
+        return bool(inserted)
+
+    @classmethod
+    async def find_tokens(
+        cls, 
+        since: int | None,
+        after_id: int | None, 
+        limit: int
+    ) -> list[RevokedTokens]:
+        """
+        Находит еще не истекшие токены, отозванные не раньше since.
+
+        Args:
+            since: время (unix), начиная с которого нужны токены. None -
+                   все еще не истекшие токены.
+            after_id: id последнего токена предыдущей страницы.
+            limit: максимальное число токенов.
+
+        Returns:
+            Список отозванных токенов, упорядоченных по id.
+        """
+
+        conditions = [cls.model.expires_at > int(time())]
+        if since is not None:
+            conditions.append(cls.model.created_at >= since)
+
+        return await super()._find_page(
+            *conditions,
+            after_id=after_id,
+            limit=limit
+        )
+
+    @classmethod
+    async def delete_expired(cls) -> bool:
+        """
+        Удаляет истекшие токены из базы данных.
+
+        Returns:
+            True - если функция завершилась без ошибок.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при удалении.
+        """
+
+        return await super()._delete_where(
+            cls.model.expires_at <= int(time())
+        )
+
+
+class AdminRulesDAO(BaseDAO[Rules]):
+    """Класс взаимодействия с данными таблиц admin_rules и версии правил."""
+
+    model = Rules
+
+    @classmethod
+    def _bump_version(cls):
+        """Формирует запрос увеличения версии правил."""
+
+        return (
+            update(RulesVersion)
+            .where(RulesVersion.id == 1)
+            .values(version=RulesVersion.version + 1)
+        )
+
+    @classmethod
+    async def find_version(cls) -> int:
+        """
+        Находит текущую версию правил.
+
+        Returns:
+            Номер версии.
+        """
+
+        async with read_session() as session:
+            query = select(RulesVersion.version).where(RulesVersion.id == 1)
+            result = await session.execute(query)
+
+            return result.scalar_one_or_none() or 0
+
+    @classmethod
+    async def find_rules(cls) -> list[Rules]:
+        """
+        Находит все правила.
+
+        Returns:
+            Список правил, упорядоченных по номеру.
+        """
+
+        return await super()._find_all_where(order_by=cls.model.id)
+
+    @classmethod
+    async def add_rule(cls, text: str) -> bool:
+        """
+        Добавляет правило и увеличивает версию правил.
+
+        Args:
+            text: текст правила.
+
+        Returns:
+            True - если функция завершилась без ошибок.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при добавлении.
+        """
+
+        await super()._execute_in_transaction(
+            insert(cls.model).values(text=text),
+            cls._bump_version()
+        )
+        return True
+
+    @classmethod
+    async def delete_rule(cls, number: int) -> bool:
+        """
+        Удаляет правило и увеличивает версию правил.
+
+        Args:
+            number: номер правила.
+
+        Returns:
+            True - если правило удалено, False - если его нет.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при удалении.
+        """
+
+        deleted, _ = await super()._execute_in_transaction(
+            delete(cls.model).where(cls.model.id == number),
+            cls._bump_version()
+        )
+        return deleted > 0
+
+
+class RateLimitsDAO(BaseDAO[RateLimits]):
+    """Класс взаимодействия с данными таблицы rate_limits."""
+
+    model = RateLimits
+
+    @classmethod
+    async def hit(cls, key: str, window_start: int) -> int:
+        """
+        Учитывает запрос в окне и возвращает число запросов в нем.
+
+        Args:
+            key: ключ ограничения (например, email или IP-адрес).
+            window_start: начало окна (unix-время).
+
+        Returns:
+            Число запросов в окне с учетом текущего.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при обновлении счетчика.
+        """
+
+        return await super()._upsert_increment(
+            ["key", "window_start"],
+            "count",
+            key=key,
+            window_start=window_start,
+            count=1
+        )
+
+    @classmethod
+    async def delete_before(cls, window_start: int) -> bool:
+        """
+        Удаляет счетчики окон, начавшихся раньше window_start.
+
+        Args:
+            window_start: граница (unix-время).
+
+        Returns:
+            True - если функция завершилась без ошибок.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при удалении.
+        """
+
+        return await super()._delete_where(
+            cls.model.window_start < window_start
+        )
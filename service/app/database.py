@@ -1,45 +1,670 @@
-from os import getenv
+import asyncio
+from contextvars import ContextVar
+from functools import cache
+from itertools import cycle
+from os import getenv, cpu_count
+from time import perf_counter, time
+from typing import Any, Callable, Iterator
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-
-load_dotenv()
+from sqlalchemy import MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 
 def get_database_url() -> str:
-    """ 
+    """
     Формирует URL для подключения к базе данных.
 
-    Returns:   
+    Если задана переменная окружения DB_URL, то используется она. Это
+    позволяет подменить Postgres локальной базой, например
+    sqlite+aiosqlite:///./test.db.
+
+    Returns:
         Строка URL для подключения к базе данных.
     """
 
+    url = getenv("DB_URL")
+    if url:
+        return url
+
     user = getenv("DB_USER")
     password = getenv("DB_PASSWORD")
     host = getenv("DB_HOST")
     port = getenv("DB_PORT")
     name = getenv("DB_NAME")
-    return f"postgresql://{user}:{password}@{host}:{port}/{name}"
+    return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{name}"
+
+
+def with_statement_cache(url: str, size: int) -> str:
+    """
+    Включает кэш подготовленных выражений на сервере для asyncpg.
+
+    asyncpg готовит каждый запрос на сервере Postgres один раз на
+    соединение и затем только передает параметры. Для других драйверов
+    URL не меняется.
+
+    Args:
+        url: URL для подключения к базе данных.
+        size: число подготовленных выражений на соединение.
+
+    Returns:
+        URL с параметром prepared_statement_cache_size.
+    """
+
+    parsed = make_url(url)
+    if parsed.drivername != "postgresql+asyncpg":
+        return url
+    if "prepared_statement_cache_size" in parsed.query:
+        return url
+
+    parsed = parsed.update_query_dict(
+        {"prepared_statement_cache_size": str(size)}
+    )
+    return parsed.render_as_string(hide_password=False)
+
+
+def get_replica_urls() -> list[str]:
+    """
+    Формирует URL для подключения к репликам базы данных.
+
+    Если задана переменная DB_REPLICA_URLS (URL через запятую), то
+    используется она. Иначе URL собираются из DB_REPLICA_HOSTS
+    (host:port через запятую) с теми же пользователем, паролем и именем
+    базы, что и у основной базы.
+
+    Returns:
+        Список URL реплик. Пустой список - реплик нет, все запросы идут
+        в основную базу.
+    """
+
+    urls = getenv("DB_REPLICA_URLS")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+
+    hosts = getenv("DB_REPLICA_HOSTS")
+    if not hosts:
+        return []
+
+    user = getenv("DB_USER")
+    password = getenv("DB_PASSWORD")
+    name = getenv("DB_NAME")
+    return [
+        f"postgresql+asyncpg://{user}:{password}@{host.strip()}/{name}"
+        for host in hosts.split(",") if host.strip()
+    ]
+
+
+def get_replica_settings() -> dict:
+    """
+    Получает настройки чтения с реплик.
+
+    Returns:
+        Словарь с URL реплик и временем в секундах, в течение которого
+        после записи чтения клиента идут в основную базу.
+    """
+
+    return {
+        "urls": get_replica_urls(),
+        "sticky_window": float(getenv("DB_READ_YOUR_WRITES_WINDOW", 5))
+    }
+
+
+def get_pool_settings() -> dict:
+    """
+    Получает настройки пула соединений с базой данных.
+
+    Проверка соединения перед выдачей из пула (DB_POOL_PRE_PING)
+    выключена по умолчанию: она добавляет обращение к базе при каждом
+    открытии сессии. Устаревшие соединения закрываются по pool_recycle.
+
+    Returns:
+        Словарь с параметрами пула для create_async_engine.
+    """
+
+    return {
+        "pool_size": int(getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": getenv("DB_POOL_PRE_PING", "false").lower() in (
+            "1", "true", "yes"
+        )
+    }
+
+
+def get_key(name: str) -> str | None:
+    """
+    Получает ключ в формате PEM из переменной окружения или из файла.
+
+    Args:
+        name: имя переменной окружения. Путь к файлу с ключом берется
+              из переменной name + "_FILE".
+
+    Returns:
+        Ключ или None, если он не задан.
+    """
+
+    key = getenv(name)
+    if key:
+        return key
+
+    path = getenv(f"{name}_FILE")
+    if path:
+        with open(path) as file:
+            return file.read()
+
+    return None
 
 
 def get_auth_data() -> dict:
     """
     Получает особые данные для создания токена.
 
+    Для HS256 используется secret_key. Для асимметричных алгоритмов
+    (EdDSA, ES256) - private_key для подписи и public_key для проверки.
+
     Returns:
         Словарь с особыми данными для генерации токена.
     """
 
     return {
         "secret_key": getenv("SECRET_KEY"),
-        "algorithm": getenv("ALGORITHM")
+        "algorithm": getenv("ALGORITHM"),
+        "private_key": get_key("JWT_PRIVATE_KEY"),
+        "public_key": get_key("JWT_PUBLIC_KEY"),
+        "backend": getenv("JWT_BACKEND", "jose")
+    }
+
+
+def get_token_settings() -> dict:
+    """
+    Получает настройки токенов.
+
+    В режиме без состояния (TOKEN_STATELESS) токен доступа живет
+    недолго и содержит роль пользователя, поэтому require_role не
+    обращается к базе данных. Новые токены доступа выдаются по токену
+    обновления.
+
+    Returns:
+        Словарь с флагом режима без состояния и временем жизни токенов
+        доступа и обновления в секундах.
+    """
+
+    return {
+        "stateless": getenv("TOKEN_STATELESS", "false").lower() in (
+            "1", "true", "yes"
+        ),
+        "access_ttl": float(getenv("ACCESS_TOKEN_TTL", 900)),
+        "refresh_ttl": float(getenv("REFRESH_TOKEN_TTL", 14 * 24 * 3600))
     }
 
 
-DB_URL = get_database_url()
-AUTH_DATA = get_auth_data()
+def get_hashing_settings() -> dict:
+    """
+    Получает настройки пула процессов для хэширования паролей.
+
+    Returns:
+        Словарь с числом процессов, размером очереди и временем ожидания
+        свободного процесса в секундах.
+    """
+
+    return {
+        "workers": int(getenv("HASH_WORKERS", cpu_count() or 1)),
+        "queue_size": int(getenv("HASH_QUEUE_SIZE", 64)),
+        "timeout": float(getenv("HASH_TIMEOUT", 5))
+    }
+
+
+def get_password_settings() -> dict:
+    """
+    Получает настройки алгоритма хэширования паролей.
+
+    Returns:
+        Словарь со схемой (bcrypt или argon2), стоимостью хэширования
+        (rounds для bcrypt, time_cost для argon2), памятью для argon2
+        в КиБ и параметрами автоматической калибровки стоимости.
+    """
+
+    cost = getenv("HASH_COST")
+    memory_cost = getenv("HASH_ARGON2_MEMORY")
+    return {
+        "scheme": getenv("HASH_SCHEME", "bcrypt"),
+        "cost": int(cost) if cost else None,
+        "memory_cost": int(memory_cost) if memory_cost else None,
+        "calibrate": getenv("HASH_CALIBRATE", "false").lower() in (
+            "1", "true", "yes"
+        ),
+        "target_ms": float(getenv("HASH_TARGET_MS", 250))
+    }
+
+
+def get_cache_settings() -> dict:
+    """
+    Получает настройки внутренних кэшей приложения.
+
+    Кэш авторизованных пользователей сбрасывается при записи только
+    в том процессе, который ее выполнил. В других процессах изменение
+    роли, деактивация или удаление пользователя вступают в силу не
+    позже чем через PRINCIPAL_CACHE_TTL секунд, поэтому это время
+    по умолчанию короткое (1 секунда).
+
+    Returns:
+        Словарь с максимальным размером и временем жизни записей
+        (в секундах) для каждого кэша, интервалом сверки версии
+        правил админа и флагом объединения одинаковых поисков в базе.
+    """
+
+    return {
+        "principal": {
+            "maxsize": int(getenv("PRINCIPAL_CACHE_SIZE", 1024)),
+            "ttl": float(getenv("PRINCIPAL_CACHE_TTL", 1))
+        },
+        "token": {
+            "maxsize": int(getenv("TOKEN_CACHE_SIZE", 4096)),
+            "ttl": float(getenv("TOKEN_CACHE_TTL", 3600))
+        },
+        "rules": {
+            "check_interval": float(getenv("RULES_CHECK_INTERVAL", 1))
+        },
+        "singleflight": {
+            "enabled": getenv("LOOKUP_SINGLEFLIGHT", "true").lower() in (
+                "1", "true", "yes"
+            )
+        }
+    }
+
+
+def get_revocation_settings() -> dict:
+    """
+    Получает настройки хранилища отозванных токенов.
+
+    Returns:
+        Словарь с типом хранилища (memory или database), интервалом
+        синхронизации между процессами и запасом, с которым
+        перечитываются недавно отозванные токены, интервалом удаления
+        истекших токенов (все в секундах) и параметрами фильтра Блума
+        (0 бит - фильтр выключен).
+    """
+
+    return {
+        "backend": getenv("REVOCATION_BACKEND", "database"),
+        "sync_interval": float(getenv("REVOCATION_SYNC_INTERVAL", 5)),
+        "sync_overlap": float(getenv("REVOCATION_SYNC_OVERLAP", 60)),
+        "purge_interval": float(getenv("REVOCATION_PURGE_INTERVAL", 3600)),
+        "bloom_bits": int(getenv("REVOCATION_BLOOM_BITS", 0)),
+        "bloom_hashes": int(getenv("REVOCATION_BLOOM_HASHES", 7))
+    }
+
+
+def get_rate_limit_settings() -> dict:
+    """
+    Получает настройки ограничения частоты входа и регистрации.
+
+    Лимиты задаются в виде "число/секунды", например "5/60".
+    Лимит "0/60" отключает ограничение.
+
+    Returns:
+        Словарь с типом хранилища (memory или database), лимитами по
+        email и по IP-адресу и максимальным числом ключей в памяти.
+    """
+
+    def parse(value: str) -> tuple[int, float]:
+        limit, window = value.split("/")
+        return int(limit), float(window)
+
+    return {
+        "backend": getenv("RATE_LIMIT_BACKEND", "memory"),
+        "email": parse(getenv("RATE_LIMIT_EMAIL", "5/60")),
+        "ip": parse(getenv("RATE_LIMIT_IP", "20/60")),
+        "max_keys": int(getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+    }
+
+
+def get_metrics_settings() -> dict:
+    """
+    Получает настройки сбора метрик запросов.
+
+    Returns:
+        Словарь с флагом добавления заголовка Server-Timing в ответы.
+    """
+
+    return {
+        "server_timing": getenv("SERVER_TIMING", "false").lower() in (
+            "1", "true", "yes"
+        )
+    }
+
+
+def get_bulk_settings() -> dict:
+    """
+    Получает настройки массового импорта и экспорта пользователей.
+
+    Returns:
+        Словарь с размером пачки для вставки, размером части при
+        чтении из базы данных и числом пользователей в одной
+        транзакции массового изменения.
+    """
+
+    return {
+        "import_batch_size": int(getenv("IMPORT_BATCH_SIZE", 500)),
+        "export_chunk_size": int(getenv("EXPORT_CHUNK_SIZE", 1000)),
+        "update_chunk_size": int(getenv("BULK_UPDATE_CHUNK_SIZE", 1000))
+    }
+
+
+@cache
+def get_settings() -> dict:
+    """
+    Загружает настройки приложения.
+
+    Файл .env читается при первом вызове, а не при импорте модуля.
+    Результат кэшируется, поэтому настройки загружаются один раз.
+
+    Returns:
+        Словарь со всеми настройками приложения.
+    """
+
+    load_dotenv()
+
+    pool = get_pool_settings()
+    return {
+        "db_url": get_database_url(),
+        "replicas": get_replica_settings(),
+        "statement_cache_size": int(
+            getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 500)
+        ),
+        "auth": get_auth_data(),
+        "tokens": get_token_settings(),
+        "hashing": get_hashing_settings(),
+        "password": get_password_settings(),
+        "cache": get_cache_settings(),
+        "pool": pool,
+        # Сколько соединений открыть при старте приложения
+        "pool_prewarm": int(getenv("DB_POOL_PREWARM", pool["pool_size"])),
+        "bulk": get_bulk_settings(),
+        "revocation": get_revocation_settings(),
+        "metrics": get_metrics_settings(),
+        "rate_limit": get_rate_limit_settings()
+    }
+
+
+class LazyObject():
+    """
+    Объект, который создается при первом обращении к его атрибутам.
+
+    Позволяет объявлять общие объекты (кэши, пулы, кодеки) на уровне
+    модуля, не читая настройки и не создавая их при импорте.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+
+    def _get_instance(self) -> Any:
+        """Создает объект при первом обращении."""
+
+        instance = self._instance
+        if instance is None:
+            instance = self._factory()
+            object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._get_instance(), name, value)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает время ожидания соединения."""
+
+    checkouts: int = 0
+    wait_time: float = 0.0
+
+    def _do_get(self):
+        """Выдает соединение из пула и замеряет время ожидания."""
+
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkouts += 1
+            self.wait_time += perf_counter() - start
+
+
+def _pool_stats(engine: AsyncEngine) -> dict:
+    """Выводит состояние пула соединений одного движка."""
+
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": pool.checkouts,
+        "wait_time_ms": round(pool.wait_time * 1000, 3)
+    }
+
+
+def get_pool_stats() -> dict:
+    """
+    Выводит состояние пулов соединений.
+
+    Returns:
+        Словарь с размером пула основной базы, числом выданных,
+        свободных и дополнительных соединений, суммарным временем
+        ожидания соединения в миллисекундах и такими же данными по
+        каждой реплике.
+    """
+
+    return {
+        **_pool_stats(get_engine()),
+        "replicas": [_pool_stats(engine) for engine in get_replica_engines()]
+    }
+
+
+async def warm_up_pool(connections: int) -> None:
+    """
+    Заранее открывает соединения с базой данных.
+
+    Соединения открываются одновременно и сразу возвращаются в пул,
+    поэтому первые запросы не тратят время на подключение. Соединения
+    открываются к основной базе и к каждой реплике.
+
+    Args:
+        connections: число соединений к каждой базе.
+    """
+
+    engines = [get_engine(), *get_replica_engines()]
+    opened = await asyncio.gather(*(
+        engine.connect().start()
+        for engine in engines
+        for _ in range(connections)
+    ))
+    await asyncio.gather(*(connection.close() for connection in opened))
+
+
+async def create_tables(metadata: MetaData) -> None:
+    """
+    Создает таблицы в базе данных без миграций.
+
+    Используется только для локальной базы (SQLite), на которой
+    запускаются тесты. Для Postgres таблицы создаются через Alembic.
+    Локальные реплики - отдельные файлы SQLite, поэтому таблицы
+    создаются и в них.
+
+    Args:
+        metadata: метаданные ORM-моделей.
+    """
+
+    for engine in [get_engine(), *get_replica_engines()]:
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.create_all)
+
+
+async def dispose_engines() -> None:
+    """Закрывает соединения с основной базой и с репликами."""
+
+    for engine in [get_engine(), *get_replica_engines()]:
+        await engine.dispose()
+
+
+@cache
+def get_engine() -> AsyncEngine:
+    """
+    Создает движок базы данных при первом обращении.
+
+    Returns:
+        Асинхронный движок SQLAlchemy.
+    """
+
+    settings = get_settings()
+    return create_async_engine(
+        with_statement_cache(
+            settings["db_url"], 
+            settings["statement_cache_size"]
+        ), 
+        poolclass=MeteredQueuePool, 
+        **settings["pool"]
+    )
+
+
+@cache
+def get_replica_engines() -> tuple[AsyncEngine, ...]:
+    """
+    Создает движки реплик при первом обращении.
+
+    Returns:
+        Асинхронные движки SQLAlchemy для каждой реплики.
+    """
+
+    settings = get_settings()
+    return tuple(
+        create_async_engine(
+            with_statement_cache(url, settings["statement_cache_size"]), 
+            poolclass=MeteredQueuePool, 
+            **settings["pool"]
+        )
+        for url in settings["replicas"]["urls"]
+    )
+
+
+@cache
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    """
+    Создает фабрику сессий при первом обращении.
+
+    Returns:
+        Фабрика асинхронных сессий.
+    """
+
+    return async_sessionmaker(get_engine(), expire_on_commit=False)
+
+
+@cache
+def get_replica_session_makers() -> Iterator[async_sessionmaker] | None:
+    """
+    Создает фабрики сессий реплик при первом обращении.
+
+    Returns:
+        Бесконечный итератор, который по кругу выдает фабрики сессий
+        реплик, или None, если реплик нет.
+    """
+
+    engines = get_replica_engines()
+    if not engines:
+        return None
+    return cycle([
+        async_sessionmaker(engine, expire_on_commit=False) 
+        for engine in engines
+    ])
+
+
+# Время (unix), до которого чтения текущего клиента идут в основную
+# базу, и флаг записи в текущем запросе
+read_your_writes: ContextVar[dict | None] = ContextVar(
+    "read_your_writes",
+    default=None
+)
+
+
+def start_read_your_writes(until: float) -> dict:
+    """
+    Начинает отслеживание записей для нового запроса.
+
+    Args:
+        until: время (unix), до которого клиент читает из основной базы
+               после своей прошлой записи. 0 - записи не было.
+
+    Returns:
+        Словарь с временем и флагом записи в текущем запросе.
+    """
+
+    state = {"until": until, "wrote": False}
+    read_your_writes.set(state)
+    return state
+
+
+def session_maker() -> AsyncSession:
+    """
+    Открывает новую сессию основной базы данных.
+
+    Returns:
+        Асинхронная сессия.
+    """
+
+    return get_session_maker()()
+
+
+def write_session() -> AsyncSession:
+    """
+    Открывает сессию основной базы для записи.
+
+    Следующие чтения этого клиента в течение DB_READ_YOUR_WRITES_WINDOW
+    секунд тоже идут в основную базу, чтобы он видел свои изменения.
+
+    Returns:
+        Асинхронная сессия.
+    """
+
+    state = read_your_writes.get()
+    if state is not None:
+        window = get_settings()["replicas"]["sticky_window"]
+        state["until"] = time() + window
+        state["wrote"] = True
+
+    return session_maker()
+
+
+def reads_from_primary() -> bool:
+    """
+    Проверяет, должны ли чтения текущего клиента идти в основную базу.
+
+    Returns:
+        True - если клиент недавно записывал данные, иначе False.
+    """
+
+    state = read_your_writes.get()
+    return state is not None and state["until"] > time()
+
+
+def read_session() -> AsyncSession:
+    """
+    Открывает сессию для чтения.
+
+    Чтение идет в одну из реплик по кругу. В основную базу оно идет,
+    если реплик нет или клиент недавно записывал данные.
+
+    Returns:
+        Асинхронная сессия.
+    """
+
+    replicas = get_replica_session_makers()
+    if replicas is None or reads_from_primary():
+        return session_maker()
 
-engine = create_engine(DB_URL)
-session_maker = sessionmaker(engine, expire_on_commit=False)
\ No newline at end of file
+    return next(replicas)()
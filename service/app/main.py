@@ -1,7 +1,151 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from math import ceil
+from time import perf_counter, time
 
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from database import get_settings, get_engine, create_tables, warm_up_pool
+from database import dispose_engines, start_read_your_writes
+from migration.models import Base
+from metrics import start_request, finish_request, render_metrics
+from metrics import instrument_engines
 from users.router import router as router_users
+from users.hashing import hashing_engine
+from users.revocation import revocation_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Подготавливает ресурсы приложения и освобождает их.
+
+    Настройки, движок базы данных и CryptContext создаются здесь при
+    первом обращении, а не при импорте модулей.
+    """
+
+    settings = get_settings()
+    engine = get_engine()
+
+    # Локальная SQLite-база не проходит миграции Alembic
+    if engine.dialect.name == "sqlite":
+        await create_tables(Base.metadata)
+
+    # Подбираем стоимость хэширования паролей под этот сервер
+    if settings["password"]["calibrate"]:
+        await asyncio.to_thread(
+            hashing_engine.calibrate,
+            settings["password"]["target_ms"]
+        )
+
+    # Открываем соединения до того, как начнем принимать запросы
+    if settings["pool_prewarm"] > 0:
+        await warm_up_pool(settings["pool_prewarm"])
+
+    # Загружаем отозванные токены и следим за отзывами в других процессах
+    await revocation_store.sync()
+    revocation_sync = asyncio.create_task(
+        revocation_store.run_sync(settings["revocation"]["sync_interval"])
+    )
+
+    yield
+
+    revocation_sync.cancel()
+    hashing_engine.shutdown()
+    await dispose_engines()
+
+
+async def timing_middleware(request: Request, call_next):
+    """Замеряет время запроса и его фаз: база данных, хэширование, JWT."""
+
+    spans = start_request()
+    start = perf_counter()
+
+    response = await call_next(request)
+
+    route = request.scope.get("route")
+    server_timing = finish_request(
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code,
+        perf_counter() - start,
+        spans
+    )
+    if get_settings()["metrics"]["server_timing"]:
+        response.headers["Server-Timing"] = server_timing
+
+    return response
+
+
+# Cookie со временем (unix), до которого чтения клиента идут в основную базу
+PRIMARY_UNTIL_COOKIE = "db_primary_until"
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """
+    Направляет чтения клиента в основную базу после его записи.
+
+    Время хранится в cookie, поэтому правило работает при нескольких
+    процессах приложения.
+    """
+
+    settings = get_settings()["replicas"]
+    if not settings["urls"]:
+        return await call_next(request)
+
+    try:
+        until = float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0))
+    except ValueError:
+        until = 0.0
+
+    # Значение приходит от клиента: дальше окна оно не продлевается,
+    # иначе клиент мог бы навсегда направить свои чтения в основную базу
+    until = min(until, time() + settings["sticky_window"])
+    state = start_read_your_writes(until)
+
+    response = await call_next(request)
+
+    if state["wrote"]:
+        response.set_cookie(
+            key=PRIMARY_UNTIL_COOKIE,
+            value=str(state["until"]),
+            max_age=ceil(settings["sticky_window"]),
+            httponly=True
+        )
+
+    return response
+
+
+async def metrics() -> PlainTextResponse:
+    """Выводит гистограммы времени запросов в формате Prometheus."""
+
+    return PlainTextResponse(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+def create_app() -> FastAPI:
+    """
+    Создает приложение.
+
+    Не читает настройки и не подключается к базе данных: это делается
+    в lifespan при запуске приложения.
+
+    Returns:
+        Приложение FastAPI.
+    """
+
+    instrument_engines()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(router_users)
+    app.middleware("http")(read_your_writes_middleware)
+    app.middleware("http")(timing_middleware)
+    app.get("/metrics", include_in_schema=False)(metrics)
+
+    return app
 
 
-app = FastAPI()
-app.include_router(router_users)
+app = create_app()
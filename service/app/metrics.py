@@ -0,0 +1,296 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Время по фазам (db, hash_wait, hash, jwt) для текущего запроса
+request_spans: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_spans",
+    default=None
+)
+
+
+class Histogram():
+    """Гистограмма в формате Prometheus с метками."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple[str, ...],
+        buckets: tuple[float, ...] = BUCKETS
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+
+        # Значения меток -> (счетчики по корзинам, сумма, количество)
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value: значение в секундах.
+            label_values: значения меток в порядке self.labels.
+        """
+
+        series = self._series.get(label_values)
+        if series is None:
+            series = [[0] * len(self.buckets), 0.0, 0]
+            self._series[label_values] = series
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        """
+        Выводит гистограмму в текстовом формате Prometheus.
+
+        Returns:
+            Список строк.
+        """
+
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram"
+        ]
+        for label_values, (counts, total, number) in self._series.items():
+            labels = ",".join(
+                f'{label}="{value}"'
+                for label, value in zip(self.labels, label_values)
+            )
+            prefix = f"{labels}," if labels else ""
+
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}'
+                )
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {number}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {number}")
+
+        return lines
+
+
+class Counter():
+    """Счетчик в формате Prometheus с метками."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple[str, ...]
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+        # Значения меток -> значение счетчика
+        self._series: dict[tuple, int] = {}
+
+    def inc(self, *label_values: str) -> None:
+        """
+        Увеличивает счетчик на единицу.
+
+        Args:
+            label_values: значения меток в порядке self.labels.
+        """
+
+        self._series[label_values] = self._series.get(label_values, 0) + 1
+
+    def render(self) -> list[str]:
+        """
+        Выводит счетчик в текстовом формате Prometheus.
+
+        Returns:
+            Список строк.
+        """
+
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter"
+        ]
+        for label_values, value in self._series.items():
+            labels = ",".join(
+                f'{label}="{value}"'
+                for label, value in zip(self.labels, label_values)
+            )
+            lines.append(f"{self.name}{{{labels}}} {value}")
+
+        return lines
+
+
+request_duration = Histogram(
+    "auth_request_duration_seconds",
+    "Время обработки запроса.",
+    ("method", "path", "status")
+)
+phase_duration = Histogram(
+    "auth_phase_duration_seconds",
+    "Время фаз запроса: база данных, ожидание и хэширование паролей, JWT.",
+    ("path", "phase")
+)
+lookup_calls = Counter(
+    "auth_lookup_calls_total",
+    "Поиски в базе данных: выполненные и объединенные с уже идущими.",
+    ("result",)
+)
+
+
+def record(phase: str, seconds: float) -> None:
+    """
+    Добавляет время фазы к текущему запросу.
+
+    Вне запроса (например, при старте приложения) ничего не делает.
+
+    Args:
+        phase: название фазы (db, hash_wait, hash, jwt).
+        seconds: длительность в секундах.
+    """
+
+    spans = request_spans.get()
+    if spans is not None:
+        spans[phase] = spans.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    Замеряет время блока кода и добавляет его к фазе текущего запроса.
+
+    Args:
+        phase: название фазы.
+    """
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, perf_counter() - start)
+
+
+def start_request() -> dict[str, float]:
+    """
+    Начинает сбор фаз для нового запроса.
+
+    Returns:
+        Словарь, в который будут записаны фазы запроса.
+    """
+
+    spans = {}
+    request_spans.set(spans)
+    return spans
+
+
+def finish_request(
+    method: str,
+    path: str,
+    status: int,
+    seconds: float,
+    spans: dict[str, float]
+) -> str:
+    """
+    Добавляет запрос в гистограммы.
+
+    Args:
+        method: HTTP-метод.
+        path: шаблон пути эндпоинта.
+        status: код ответа.
+        seconds: общее время запроса.
+        spans: время по фазам.
+
+    Returns:
+        Значение заголовка Server-Timing.
+    """
+
+    request_duration.observe(seconds, method, path, str(status))
+    for phase, phase_seconds in spans.items():
+        phase_duration.observe(phase_seconds, path, phase)
+
+    timings = [
+        f"{phase};dur={phase_seconds * 1000:.3f}"
+        for phase, phase_seconds in spans.items()
+    ]
+    timings.append(f"total;dur={seconds * 1000:.3f}")
+    return ", ".join(timings)
+
+
+def render_metrics() -> str:
+    """
+    Выводит все метрики в текстовом формате Prometheus.
+
+    Returns:
+        Текст метрик.
+    """
+
+    lines = (
+        request_duration.render() 
+        + phase_duration.render() 
+        + lookup_calls.render()
+    )
+    return "\n".join(lines) + "\n"
+
+
+def before_cursor_execute(conn, cursor, statement, params, context, many):
+    """
+    Запоминает время начала SQL-запроса.
+
+    Соединение выполняет один запрос за раз, поэтому хранится одно
+    время, а не список.
+    """
+
+    conn.info["query_start"] = perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, params, context, many):
+    """Добавляет время SQL-запроса к фазе db текущего запроса."""
+
+    start = conn.info.pop("query_start", None)
+    if start is not None:
+        record("db", perf_counter() - start)
+
+
+def handle_error(context) -> None:
+    """
+    Добавляет время запроса, завершившегося ошибкой.
+
+    При ошибке (например, IntegrityError) after_cursor_execute не
+    вызывается, поэтому время начала убирается здесь.
+    """
+
+    if context.connection is None:
+        return
+
+    start = context.connection.info.pop("query_start", None)
+    if start is not None:
+        record("db", perf_counter() - start)
+
+
+def instrument_engines() -> None:
+    """
+    Подключает замер времени SQL-запросов ко всем движкам.
+
+    Обработчики вешаются на класс Engine, поэтому движок можно создать
+    позже. Повторный вызов ничего не делает.
+    """
+
+    if event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        return
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(Engine, "handle_error", handle_error)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index, UniqueConstraint, event, func
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
 
 
@@ -8,6 +9,12 @@ class Users(Base):
     """ORM-модель для таблицы users."""
     
     __tablename__ = "users"
+    __table_args__ = (
+        # Индексы для постраничного вывода пользователей с фильтрами
+        Index("ix_users_role_id", "role", "id"),
+        Index("ix_users_is_active_id", "is_active", "id"),
+        Index("ix_users_role_is_active_id", "role", "is_active", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     email: Mapped[str] = mapped_column(unique=True)
@@ -18,6 +25,10 @@ class Users(Base):
     is_active: Mapped[bool] = mapped_column()
     role: Mapped[str] = mapped_column()
 
+    # Увеличивается при изменении или удалении пользователя, после чего
+    # токены обновления, выданные раньше, перестают действовать
+    token_version: Mapped[int] = mapped_column(default=0, server_default="0")
+
     def get_dict(self):
         """
         Выводит данные о пользователе в виде словаря.
@@ -35,3 +46,84 @@ class Users(Base):
             "is_active": self.is_active,
             "role": self.role
         }
+
+
+# Почта уникальна без учета регистра. Поиск пользователя по почте
+# сравнивает lower(email), поэтому использует этот индекс
+Index("ix_users_email_lower", func.lower(Users.email), unique=True)
+
+
+class RevokedTokens(Base):
+    """ORM-модель для таблицы revoked_tokens (отозванные токены)."""
+
+    __tablename__ = "revoked_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    jti: Mapped[str] = mapped_column(unique=True)
+    expires_at: Mapped[int] = mapped_column(index=True)
+
+    # Время отзыва (unix). Процессы перечитывают токены, отозванные за
+    # последние секунды, а не только после последнего id: id выдается
+    # до коммита, и строка с меньшим id может появиться позже
+    created_at: Mapped[int] = mapped_column(
+        index=True, 
+        default=0, 
+        server_default="0"
+    )
+
+
+class RateLimits(Base):
+    """ORM-модель для таблицы rate_limits (счетчики запросов по окнам)."""
+
+    __tablename__ = "rate_limits"
+    __table_args__ = (UniqueConstraint("key", "window_start"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column()
+    window_start: Mapped[int] = mapped_column(index=True)
+    count: Mapped[int] = mapped_column()
+
+
+# Правила, которые добавляются при создании таблицы admin_rules
+DEFAULT_RULES = [
+    "Все пользователи должны иметь уникальный логин.",
+    "Пароль должен быть минимум 8 символов.",
+    "Доступ к админ-панели только для администраторов."
+]
+
+
+class Rules(Base):
+    """ORM-модель для таблицы admin_rules (правила админа)."""
+
+    __tablename__ = "admin_rules"
+    # Номера удаленных правил не используются повторно
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    text: Mapped[str] = mapped_column()
+
+
+class RulesVersion(Base):
+    """ORM-модель для таблицы admin_rules_version (версия правил)."""
+
+    __tablename__ = "admin_rules_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column()
+
+
+@event.listens_for(Rules.__table__, "after_create")
+def insert_default_rules(target, connection, **kwargs):
+    """Добавляет правила по умолчанию при создании таблицы без миграций."""
+
+    connection.execute(
+        target.insert(), 
+        [{"text": text} for text in DEFAULT_RULES]
+    )
+
+
+@event.listens_for(RulesVersion.__table__, "after_create")
+def insert_rules_version(target, connection, **kwargs):
+    """Добавляет строку с версией правил при создании таблицы."""
+
+    connection.execute(target.insert(), [{"id": 1, "version": 0}])
@@ -1,31 +1,63 @@
+from time import monotonic
+
+from database import get_settings
+from dao.dao_models import AdminRulesDAO
+
+
 class AdminRules():
-    """Класс для взамодействия с правилами."""
+    """
+    Класс для взамодействия с правилами.
+
+    Правила хранятся в таблице admin_rules, а в процессе кэшируются
+    вместе с номером версии. Версия увеличивается при каждом изменении
+    правил, поэтому другим процессам достаточно сверить номер версии,
+    чтобы понять, нужно ли перечитать правила.
+    """
+
+    _rules: dict = {"rules": {}}
+    _version: int | None = None
+    _checked_at: float = 0.0
+
+    @classmethod
+    async def get_rules(cls) -> dict:
+        """
+        Выводит правила админа.
+
+        Версия сверяется не чаще, чем раз в RULES_CHECK_INTERVAL секунд.
+        """
+
+        now = monotonic()
+        interval = get_settings()["cache"]["rules"]["check_interval"]
+        if cls._version is not None and now - cls._checked_at < interval:
+            return cls._rules
 
-    rules: dict = {
-        "rules": {
-            1: "Все пользователи должны иметь уникальный логин.",
-            2: "Пароль должен быть минимум 8 символов.",
-            3: "Доступ к админ-панели только для администраторов."
-        }
-    }
+        # Версия читается до правил: если правила поменяются между
+        # запросами, то при следующей сверке они перечитаются
+        version = await AdminRulesDAO.find_version()
+        if version != cls._version:
+            rules = await AdminRulesDAO.find_rules()
+            cls._rules = {"rules": {rule.id: rule.text for rule in rules}}
+            cls._version = version
+        cls._checked_at = now
+
+        return cls._rules
 
     @classmethod
-    def add_rules(cls, new_rule: str) -> dict:
+    async def add_rules(cls, new_rule: str) -> dict:
         """Добавляет правило в правила админа."""
 
         # Новое правило добавляется последним по номеру
-        mx = max(cls.rules["rules"].keys())
-        cls.rules["rules"][mx + 1] = new_rule
-        return cls.rules
+        await AdminRulesDAO.add_rule(new_rule)
+
+        cls._version = None
+        return await cls.get_rules()
     
     @classmethod
-    def del_rules(cls, number_rule: int) -> dict:
+    async def del_rules(cls, number_rule: int) -> dict:
         """Удаляет правило из правил админа."""
 
-        mx = max(cls.rules["rules"].keys())
-        if number_rule > mx:
+        if not await AdminRulesDAO.delete_rule(number_rule):
             return {"message": "Правила с таким номером нет"}
         
-        del cls.rules["rules"][number_rule]
-        return cls.rules
-
+        cls._version = None
+        return await cls.get_rules()
@@ -1,21 +1,164 @@
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from hashlib import sha256
+from time import time
+from uuid import uuid4
 
-from passlib.context import CryptContext
-from jose import jwt
+from jose import jwt, jwk
 from pydantic import EmailStr
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, Response
 
-from database import AUTH_DATA
-from dao.dao_models import UsersDAO
+from database import get_settings, LazyObject
+from cache import principal_cache, token_cache
+from metrics import timed
+from dao.dao_models import UsersDAO, Credentials, Principal
+from users.hashing import hashing_engine, pwd_context
+from users.revocation import revocation_store
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class TokenCodec():
+    """
+    Базовый класс кодирования и проверки токенов.
+
+    Объекты ключей строятся один раз при создании кодека, а не при
+    каждом вызове encode/decode.
+    """
+
+    algorithms: tuple[str, ...] = ()
+
+    def __init__(
+        self, 
+        algorithm: str, 
+        secret_key: str | None = None,
+        private_key: str | None = None,
+        public_key: str | None = None
+    ) -> None:
+        if algorithm not in self.algorithms:
+            raise ValueError(
+                f"Алгоритм {algorithm} не поддерживается {type(self).__name__}"
+            )
+
+        self.algorithm = algorithm
+        if algorithm.startswith("HS"):
+            self._signing_key = self._build_key(secret_key)
+            self._verifying_key = self._signing_key
+        else:
+            self._signing_key = self._build_key(private_key)
+            self._verifying_key = self._build_key(public_key)
+
+    def _build_key(self, key: str):
+        """Строит объект ключа библиотеки."""
+
+        raise NotImplementedError
+
+    def encode(self, claims: dict) -> str:
+        """
+        Подписывает данные и создает токен.
+
+        Args:
+            claims: данные токена.
+
+        Returns:
+            Токен.
+        """
+
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        """
+        Проверяет подпись и срок действия токена и расшифровывает его.
+
+        Args:
+            token: токен.
+
+        Returns:
+            Словарь с данными токена.
+        """
+
+        raise NotImplementedError
+
+
+class JoseCodec(TokenCodec):
+    """Кодек на основе python-jose."""
+
+    algorithms = ("HS256", "ES256")
+
+    def _build_key(self, key: str):
+        return jwk.construct(key, self.algorithm)
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self._signing_key, self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        return jwt.decode(token, self._verifying_key, self.algorithm)
 
 
-def hash_password(password: str) -> str:
+class PyJWTCodec(TokenCodec):
+    """Кодек на основе PyJWT."""
+
+    algorithms = ("HS256", "ES256", "EdDSA")
+
+    def __init__(self, *args, **kwargs) -> None:
+        # PyJWT - необязательная зависимость, нужна только этому кодеку
+        import jwt as pyjwt
+
+        self._pyjwt = pyjwt
+        super().__init__(*args, **kwargs)
+
+    def _build_key(self, key: str):
+        algorithm = self._pyjwt.get_algorithm_by_name(self.algorithm)
+        return algorithm.prepare_key(key)
+
+    def encode(self, claims: dict) -> str:
+        return self._pyjwt.encode(claims, self._signing_key, self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        return self._pyjwt.decode(
+            token, 
+            self._verifying_key, 
+            [self.algorithm]
+        )
+
+
+TOKEN_CODECS = {
+    "jose": JoseCodec,
+    "pyjwt": PyJWTCodec
+}
+
+
+def create_token_codec(auth_data: dict) -> TokenCodec:
+    """
+    Создает кодек токенов по настройкам.
+
+    Args:
+        auth_data: словарь из database.get_auth_data.
+
+    Returns:
+        Кодек выбранной библиотеки (JWT_BACKEND) с готовыми ключами.
+
+    Raises:
+        ValueError - если библиотека не поддерживает алгоритм.
+    """
+
+    return TOKEN_CODECS[auth_data["backend"]](
+        auth_data["algorithm"],
+        secret_key=auth_data["secret_key"],
+        private_key=auth_data["private_key"],
+        public_key=auth_data["public_key"]
+    )
+
+
+token_codec = LazyObject(
+    lambda: create_token_codec(get_settings()["auth"])
+)
+
+
+async def hash_password(password: str) -> str:
     """
     Хэширует пароль пользователя.
+
+    Хэширование выполняется в пуле процессов, чтобы не блокировать
+    цикл событий.
     
     Args:
         password: пароль для хеширования.
@@ -24,15 +167,55 @@ def hash_password(password: str) -> str:
         Хэш пароля.
     """
 
-    return pwd_context.hash(password)
+    return await hashing_engine.hash(password)
+
+
+def _encode_token(claims: dict, ttl: timedelta) -> str:
+    """
+    Подписывает данные токена, добавив срок действия и jti.
+
+    Args:
+        claims: данные токена.
+        ttl: время жизни токена.
+
+    Returns:
+        Токен.
+
+    Raises:
+        Exception - если возникла ошибка при генерации токена.
+    """
+
+    to_encode = {
+        **claims,
+        "exp": datetime.now(timezone.utc) + ttl,
+        "jti": uuid4().hex
+    }
+
+    try:
+        with timed("jwt"):
+            token = token_codec.encode(to_encode)
+    except Exception as error:
+        raise error
+
+    return token
 
 
-def create_access_token(email: EmailStr) -> str:
+def create_access_token(
+    email: EmailStr, 
+    user: Principal | Credentials | None = None
+) -> str:
     """
     Создает токен для пользователя.
 
+    Токен содержит уникальный идентификатор jti, по которому его
+    можно отозвать. В режиме без состояния (TOKEN_STATELESS) токен
+    живет ACCESS_TOKEN_TTL секунд и содержит id, роль и версию
+    токенов пользователя.
+
     Args:
         email: электронная почта.
+        user: данные пользователя (id, role, token_version). Без них
+              создается токен, который содержит только почту.
     
     Returns:
         Токен пользователя.
@@ -41,19 +224,185 @@ def create_access_token(email: EmailStr) -> str:
         Exception - если возникла ошибка при генерации токена. 
     """
 
-    expire = datetime.now(timezone.utc) + timedelta(days=14)
-    to_encode = {"email": email, "exp": expire}
+    settings = get_settings()["tokens"]
+    if not settings["stateless"] or user is None:
+        return _encode_token({"email": email}, timedelta(days=14))
+
+    return _encode_token(
+        {
+            "email": email,
+            "type": "access",
+            "user_id": user.id,
+            "role": user.role,
+            "ver": user.token_version
+        },
+        timedelta(seconds=settings["access_ttl"])
+    )
+
+
+def create_refresh_token(
+    email: EmailStr, 
+    user: Principal | Credentials
+) -> str:
+    """
+    Создает токен обновления, по которому выдаются новые токены доступа.
+
+    Args:
+        email: электронная почта.
+        user: данные пользователя (id, token_version).
+
+    Returns:
+        Токен обновления.
+
+    Raises:
+        Exception - если возникла ошибка при генерации токена.
+    """
+
+    return _encode_token(
+        {
+            "email": email,
+            "type": "refresh",
+            "user_id": user.id,
+            "ver": user.token_version
+        },
+        timedelta(seconds=get_settings()["tokens"]["refresh_ttl"])
+    )
+
+
+def issue_tokens(
+    response: Response, 
+    email: EmailStr, 
+    user: Principal | Credentials
+) -> None:
+    """
+    Выдает пользователю токен доступа, а в режиме без состояния и
+    токен обновления.
+
+    Args:
+        response: ответ, в который записываются cookie с токенами.
+        email: электронная почта.
+        user: данные пользователя (id, role, token_version).
+    """
+
+    token = create_access_token(email, user)
+    response.set_cookie(key="users_access_token", value=token, httponly=True)
+
+    if get_settings()["tokens"]["stateless"]:
+        response.set_cookie(
+            key="users_refresh_token", 
+            value=create_refresh_token(email, user), 
+            httponly=True
+        )
+
+
+def _decode_token(token: str) -> dict:
+    """
+    Проверяет подпись токена и расшифровывает его без кэша.
+
+    Args:
+        token: токен пользователя.
+
+    Returns:
+        Словарь с данными токена.
+
+    Raises:
+        HTTPException(401) - если подпись неверна или срок действия
+        токена истек.
+    """
 
     try:
-        token = jwt.encode(
-            to_encode, 
-            key=AUTH_DATA["secret_key"],
-            algorithm=AUTH_DATA["algorithm"]
+        with timed("jwt"):
+            user_data = token_codec.decode(token)
+    except Exception:
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
         )
-    except Exception as error:
-        raise error
-    
-    return token
+
+    return user_data
+
+
+def decode_token_claims(token: str) -> dict:
+    """
+    Расшифровывает токен пользователя с учетом кэша проверенных токенов.
+
+    Кэш хранит данные уже проверенных токенов по sha256 от токена.
+    Запись живет не дольше, чем сам токен (поле exp). Отозванные
+    токены отклоняются и при попадании в кэш.
+
+    Args:
+        token: токен пользователя.
+
+    Returns:
+        Словарь с данными токена.
+
+    Raises:
+        HTTPException(401) - если токен отозван, подпись неверна или
+        срок действия токена истек.
+    """
+
+    digest = sha256(token.encode()).digest()
+    user_data = token_cache.get(digest)
+    if user_data is None:
+        user_data = _decode_token(token)
+
+        ttl = user_data.get("exp", 0) - time()
+        if ttl > 0:
+            token_cache.set(digest, user_data, ttl=ttl)
+
+    if revocation_store.is_revoked(user_data.get("jti")):
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
+        )
+
+    return user_data
+
+
+async def revoke_tokens(*tokens: str | None) -> None:
+    """
+    Отзывает токены пользователя до истечения их срока.
+
+    Недействительные, истекшие и уже отозванные токены пропускаются:
+    ими и так нельзя воспользоваться.
+
+    Args:
+        tokens: токены доступа и обновления.
+    """
+
+    for token in tokens:
+        if token is None:
+            continue
+        try:
+            user_data = decode_token_claims(token)
+        except HTTPException:
+            continue
+        await revocation_store.revoke(user_data.get("jti"), user_data["exp"])
+
+
+def decode_access_claims(token: str) -> dict:
+    """
+    Расшифровывает токен доступа.
+
+    Args:
+        token: токен пользователя.
+
+    Returns:
+        Словарь с данными токена.
+
+    Raises:
+        HTTPException(401) - если токен недействителен, отозван или
+        является токеном обновления.
+    """
+
+    user_data = decode_token_claims(token)
+    if user_data.get("type") == "refresh":
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
+        )
+
+    return user_data
 
 
 def decode_access_token(token: str) -> EmailStr:
@@ -67,41 +416,99 @@ def decode_access_token(token: str) -> EmailStr:
         Электронную почту пользователя.
 
     Raises:
-        Exception - если возникла ошибка при расшифровке токена.
+        HTTPException(401) - если токен недействителен или отозван.
     """
 
-    try:
-        user_data = jwt.decode(
-            token, 
-            AUTH_DATA["secret_key"],
-            AUTH_DATA["algorithm"]
+    return decode_access_claims(token).get("email")
+
+
+async def refresh_access_token(token: str) -> tuple[EmailStr, Principal]:
+    """
+    Проверяет токен обновления.
+
+    Токен действует, пока версия токенов пользователя не изменилась:
+    она увеличивается при изменении и удалении пользователя. Токен
+    одноразовый: после проверки он отзывается, и только один из
+    одновременных запросов с ним получает новые токены.
+
+    Args:
+        token: токен обновления.
+
+    Returns:
+        Кортеж (почта, актуальные данные пользователя) для выдачи
+        новых токенов.
+
+    Raises:
+        HTTPException(401) - если токен недействителен, отозван, выдан
+        до изменения пользователя или пользователь удален.
+    """
+
+    user_data = decode_token_claims(token)
+    if user_data.get("type") != "refresh":
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
+        )
+
+    email = user_data["email"]
+    user = await UsersDAO.find_principal(email=email)
+    if isinstance(user, bool) or user.token_version != user_data["ver"]:
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
+        )
+
+    # Новые токены выдаются, только если этот запрос отозвал старый
+    if not await revocation_store.claim(
+        user_data.get("jti"), 
+        user_data["exp"]
+    ):
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
         )
-    except Exception as error:
-        raise error
-    
-    return user_data.get("email")
 
+    return email, user
 
-def verify_password(email: EmailStr, password: str) -> bool:
+
+async def verify_password(
+    email: EmailStr, 
+    password: str
+) -> Credentials | None:
     """
     Проверяет, соответствует ли введённый пароль сохранённому хэшу.
 
+    Если пароль совпал, но хэш устарел (старая схема или меньшая
+    стоимость), то пароль перехэшируется и сохраняется в базу данных.
+
     Args:
         email: электронная почта пользователя.
         password: пароль, который нужно проверить.
     
     Returns:
-        True - если пароль совпал, иначе False.
+        Данные пользователя для выдачи токенов - если пароль совпал,
+        иначе None.
+
+    Raises:
+        HTTPException(503) - если пул хэширования перегружен.
     """
 
-    user = UsersDAO.find_user(email=email)
-    if isinstance(user, bool):
-        return False
+    credentials = await UsersDAO.find_credentials(email=email)
+    if isinstance(credentials, bool):
+        return None
     
-    if pwd_context.verify(password, user.password) is False:
-        return False
+    if await hashing_engine.verify(password, credentials.password) is False:
+        return None
+
+    # Пароль не меняется, поэтому выданные токены остаются действительными
+    if pwd_context.needs_update(credentials.password):
+        await UsersDAO.update_user(
+            email=email, 
+            bump_version=False,
+            password=await hash_password(password)
+        )
 
-    return True
+    return credentials
 
 
 def require_role(role: str):
@@ -123,7 +530,7 @@ def require_role(role: str):
         """Внутренняя функция декоратор."""
 
         @wraps(func)
-        def wrapper(*args, **kwargs):
+        async def wrapper(*args, **kwargs):
             """Авторизует пользователя."""
 
             request: Request = kwargs.get("request")
@@ -135,21 +542,38 @@ def require_role(role: str):
                     detail="Пользователь не авторизован"
                 )
 
-            user_email = decode_access_token(token)
-            user = UsersDAO.find_user(email=user_email)
-
-            if isinstance(user, bool):
-                raise HTTPException(
-                    status_code=401, 
-                    detail="Пользователь не авторизован"
-                )
+            user_data = decode_access_claims(token)
+            user_email = user_data.get("email")
+
+            if "role" in user_data and get_settings()["tokens"]["stateless"]:
+                # Короткоживущий токен уже содержит роль
+                user_role = user_data["role"]
+            else:
+                # Активные пользователи кэшируются, чтобы не ходить в базу.
+                # Другие процессы видят изменения пользователя не позже
+                # чем через PRINCIPAL_CACHE_TTL секунд
+                user = principal_cache.get(user_email)
+                if user is None:
+                    # Если пользователя изменят или удалят, пока идет
+                    # поиск, то найденные данные не попадут в кэш
+                    since = principal_cache.generation
+                    user = await UsersDAO.find_principal(email=user_email)
+                    if not isinstance(user, bool):
+                        principal_cache.set(user_email, user, since=since)
+
+                if isinstance(user, bool):
+                    raise HTTPException(
+                        status_code=401, 
+                        detail="Пользователь не авторизован"
+                    )
+                user_role = user.role
           
-            if user.role != role:
+            if user_role != role:
                 raise HTTPException(
                     status_code=403,
                     detail="Нет доступа"
                 )
             
-            return func(*args, **kwargs)
+            return await func(*args, **kwargs)
         return wrapper
     return decorator
\ No newline at end of file
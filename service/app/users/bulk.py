@@ -0,0 +1,226 @@
+import asyncio
+import csv
+import json
+from io import StringIO
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from database import get_settings
+from dao.dao_models import UsersDAO
+from users.auth import hash_password
+from users.hashing import hashing_engine
+from users.validation import SUser_import
+
+
+EXPORT_FIELDS = [
+    "id", "email", "name", "surname", "middle_name", "is_active", "role"
+]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Разбивает поток байтов на строки.
+
+    Args:
+        chunks: поток частей тела запроса.
+
+    Yields:
+        Непустые строки без символов перевода строки.
+    """
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.decode().rstrip("\r")
+            if line:
+                yield line
+
+    line = buffer.decode().rstrip("\r")
+    if line:
+        yield line
+
+
+async def iter_records(
+    lines: AsyncIterator[str], 
+    file_format: str
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Разбирает строки NDJSON или CSV в словари.
+
+    Для CSV первая строка считается заголовком.
+
+    Args:
+        lines: поток строк.
+        file_format: "ndjson" или "csv".
+
+    Yields:
+        Кортеж (номер строки, данные, ошибка). Если строку не удалось
+        разобрать, то данные - None.
+    """
+
+    header = None
+    number = 0
+    async for line in lines:
+        if file_format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = values
+                continue
+
+            number += 1
+            if len(values) != len(header):
+                yield number, None, "Неверное число столбцов"
+            else:
+                yield number, dict(zip(header, values)), None
+            continue
+
+        number += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield number, None, "Строка не является JSON"
+            continue
+
+        if not isinstance(record, dict):
+            yield number, None, "Строка не является JSON-объектом"
+        else:
+            yield number, record, None
+
+
+async def _import_batch(
+    batch: list[tuple[int, SUser_import]], 
+    results: list[dict]
+) -> None:
+    """
+    Хэширует пароли пачки пользователей и добавляет их одним запросом.
+
+    Args:
+        batch: список пар (номер строки, данные пользователя).
+        results: список, в который добавляются результаты по строкам.
+    """
+
+    # Повторная почта внутри пачки не попадает в запрос
+    unique = {}
+    for number, user in batch:
+        if user.email in unique:
+            results.append({
+                "row": number, 
+                "email": user.email, 
+                "status": "duplicate"
+            })
+        else:
+            unique[user.email] = (number, user)
+
+    # Хэшируем параллельно, но не занимаем больше процессов, чем есть
+    limit = asyncio.Semaphore(hashing_engine.workers)
+
+    async def hash_limited(password: str) -> str:
+        async with limit:
+            return await hash_password(password)
+
+    hashed = await asyncio.gather(
+        *(hash_limited(user.password) for _, user in unique.values())
+    )
+
+    created = await UsersDAO.add_users([
+        {**user.model_dump(), "password": password}
+        for (_, user), password in zip(unique.values(), hashed)
+    ])
+
+    for email, (number, _) in unique.items():
+        results.append({
+            "row": number,
+            "email": email,
+            "status": "created" if email in created else "exists"
+        })
+
+
+async def import_users(chunks: AsyncIterator[bytes], file_format: str) -> dict:
+    """
+    Импортирует пользователей из потока NDJSON или CSV.
+
+    Файл читается построчно, пользователи добавляются пачками по
+    IMPORT_BATCH_SIZE, поэтому файл целиком в память не загружается.
+
+    Args:
+        chunks: поток частей тела запроса.
+        file_format: "ndjson" или "csv".
+
+    Returns:
+        Словарь с итогами импорта и результатом по каждой строке.
+
+    Raises:
+        HTTPException(503) - если пул хэширования перегружен.
+        SQLAlchemyError - если возникла ошибка при добавлении.
+    """
+
+    batch_size = get_settings()["bulk"]["import_batch_size"]
+    results = []
+    batch = []
+    records = iter_records(iter_lines(chunks), file_format)
+    async for number, record, error in records:
+        if error is not None:
+            results.append({"row": number, "status": "invalid", "error": error})
+            continue
+
+        try:
+            user = SUser_import.model_validate(record)
+        except ValidationError as error:
+            results.append({
+                "row": number, 
+                "status": "invalid", 
+                "error": error.errors()[0]["msg"]
+            })
+            continue
+
+        batch.append((number, user))
+        if len(batch) >= batch_size:
+            await _import_batch(batch, results)
+            batch = []
+
+    await _import_batch(batch, results)
+
+    results.sort(key=lambda result: result["row"])
+    summary = {"created": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        summary[result["status"]] += 1
+
+    return {**summary, "rows": results}
+
+
+async def export_users(file_format: str) -> AsyncIterator[str]:
+    """
+    Выгружает всех пользователей в формате NDJSON или CSV.
+
+    Пользователи читаются из базы частями по EXPORT_CHUNK_SIZE.
+
+    Args:
+        file_format: "ndjson" или "csv".
+
+    Yields:
+        Часть файла с данными пользователей.
+    """
+
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if file_format == "csv":
+        writer.writeheader()
+
+    chunk_size = get_settings()["bulk"]["export_chunk_size"]
+    async for users in UsersDAO.stream_users(chunk_size):
+        for user in users:
+            if file_format == "csv":
+                writer.writerow(user.get_dict())
+            else:
+                buffer.write(json.dumps(user.get_dict(), ensure_ascii=False))
+                buffer.write("\n")
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,332 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from passlib.context import CryptContext
+from fastapi import HTTPException
+
+from database import get_settings, LazyObject
+from metrics import record, timed
+
+
+# Диапазоны стоимости, которые перебираются при калибровке
+COST_RANGES = {
+    "bcrypt": range(4, 21),
+    "argon2": range(1, 21)
+}
+
+
+def get_context_config(
+    scheme: str, 
+    cost: int | None = None, 
+    memory_cost: int | None = None
+) -> dict:
+    """
+    Формирует настройки CryptContext.
+
+    Хэши старой схемы и хэши с меньшей стоимостью помечаются устаревшими,
+    поэтому pwd_context.needs_update возвращает для них True.
+
+    Args:
+        scheme: схема хэширования (bcrypt или argon2).
+        cost: rounds для bcrypt или time_cost для argon2. Если None, то
+              используется значение библиотеки по умолчанию.
+        memory_cost: память для argon2 в КиБ.
+
+    Returns:
+        Словарь с настройками CryptContext.
+    """
+
+    # bcrypt остается в списке, чтобы проверять старые хэши
+    schemes = [scheme] if scheme == "bcrypt" else [scheme, "bcrypt"]
+    config = {"schemes": schemes, "deprecated": "auto"}
+
+    if cost is not None:
+        config[f"{scheme}__rounds"] = cost
+        config[f"{scheme}__min_rounds"] = cost
+    if scheme == "argon2" and memory_cost is not None:
+        config["argon2__memory_cost"] = memory_cost
+
+    return config
+
+
+def measure_cost(
+    scheme: str, 
+    cost: int, 
+    memory_cost: int | None = None, 
+    number: int = 3
+) -> float:
+    """
+    Измеряет время хэширования пароля с заданной стоимостью.
+
+    Args:
+        scheme: схема хэширования.
+        cost: rounds для bcrypt или time_cost для argon2.
+        memory_cost: память для argon2 в КиБ.
+        number: число замеров.
+
+    Returns:
+        Минимальное время хэширования в миллисекундах.
+    """
+
+    context = CryptContext(**get_context_config(scheme, cost, memory_cost))
+
+    timings = []
+    for _ in range(number):
+        start = perf_counter()
+        context.hash("calibration-password")
+        timings.append(perf_counter() - start)
+
+    return min(timings) * 1000
+
+
+def calibrate_cost(
+    scheme: str, 
+    target_ms: float, 
+    memory_cost: int | None = None
+) -> int:
+    """
+    Подбирает стоимость хэширования под целевое время на этом сервере.
+
+    Args:
+        scheme: схема хэширования.
+        target_ms: целевое время хэширования в миллисекундах.
+        memory_cost: память для argon2 в КиБ.
+
+    Returns:
+        Наибольшая стоимость, при которой хэширование укладывается
+        в target_ms, но не меньше минимальной.
+    """
+
+    costs = COST_RANGES[scheme]
+    chosen = costs[0]
+    for cost in costs:
+        if measure_cost(scheme, cost, memory_cost) > target_ms:
+            break
+        chosen = cost
+
+    return chosen
+
+
+def create_context() -> CryptContext:
+    """
+    Создает CryptContext по настройкам приложения.
+
+    Returns:
+        Настроенный CryptContext.
+    """
+
+    settings = get_settings()["password"]
+    return CryptContext(**get_context_config(
+        settings["scheme"],
+        settings["cost"],
+        settings["memory_cost"]
+    ))
+
+
+pwd_context = LazyObject(create_context)
+
+
+def _init_worker(config: dict) -> None:
+    """Настраивает CryptContext в новом процессе пула."""
+
+    pwd_context.load(config)
+
+
+def _hash(password: str) -> str:
+    """Хэширует пароль внутри процесса пула."""
+
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    """Проверяет пароль внутри процесса пула."""
+
+    return pwd_context.verify(password, hashed_password)
+
+
+class HashingEngine():
+    """
+    Пул процессов для хэширования и проверки паролей.
+
+    Одновременно выполняется не больше workers задач. Остальные ждут
+    в очереди размером queue_size не дольше timeout секунд. Если очередь
+    заполнена или время ожидания вышло, запрос отклоняется с кодом 503.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._context_config = pwd_context.to_dict()
+        self._slots = asyncio.Semaphore(workers)
+        self._waiting = 0
+        self._in_flight = 0
+        self._latencies: deque[float] = deque(maxlen=1000)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Создает пул процессов при первом обращении."""
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._context_config,)
+            )
+        return self._executor
+
+    def configure(self, config: dict) -> None:
+        """
+        Меняет настройки хэширования в приложении и в пуле процессов.
+
+        Процессы пула пересоздаются при следующем обращении.
+
+        Args:
+            config: настройки CryptContext.
+        """
+
+        pwd_context.load(config)
+        self._context_config = pwd_context.to_dict()
+        self.shutdown()
+
+    def calibrate(self, target_ms: float) -> int:
+        """
+        Подбирает стоимость хэширования и применяет ее.
+
+        Args:
+            target_ms: целевое время хэширования в миллисекундах.
+
+        Returns:
+            Выбранная стоимость.
+        """
+
+        scheme = get_settings()["password"]["scheme"]
+        memory_cost = get_settings()["password"]["memory_cost"]
+
+        cost = calibrate_cost(scheme, target_ms, memory_cost)
+        self.configure(get_context_config(scheme, cost, memory_cost))
+        return cost
+
+    async def _acquire_slot(self) -> None:
+        """
+        Ожидает свободный процесс пула.
+
+        Raises:
+            HTTPException(503) - если очередь заполнена или время ожидания
+            истекло.
+        """
+
+        if self._waiting >= self.queue_size:
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис перегружен, повторите запрос позже"
+            )
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис перегружен, повторите запрос позже"
+            )
+        finally:
+            self._waiting -= 1
+
+    async def _run(self, func, *args):
+        """
+        Выполняет функцию в пуле процессов с учетом очереди.
+
+        Ожидание свободного процесса записывается в фазу hash_wait,
+        само хэширование - в фазу hash.
+        """
+
+        with timed("hash_wait"):
+            await self._acquire_slot()
+
+        self._in_flight += 1
+        start = perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(),
+                func,
+                *args
+            )
+        finally:
+            elapsed = perf_counter() - start
+            self._latencies.append(elapsed)
+            record("hash", elapsed)
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """
+        Хэширует пароль.
+
+        Args:
+            password: пароль для хеширования.
+
+        Returns:
+            Хэш пароля.
+        """
+
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Проверяет пароль по хэшу.
+
+        Args:
+            password: пароль, который нужно проверить.
+            hashed_password: сохранённый хэш.
+
+        Returns:
+            True - если пароль совпал, иначе False.
+        """
+
+        return await self._run(_verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        """
+        Выводит статистику пула.
+
+        Returns:
+            Словарь с глубиной очереди, числом выполняемых задач и
+            задержкой хэширования (p50/p99) в миллисекундах.
+        """
+
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            index = min(len(latencies) - 1, int(len(latencies) * p))
+            return round(latencies[index] * 1000, 3)
+
+        scheme = pwd_context.default_scheme()
+        return {
+            "scheme": scheme,
+            "cost": pwd_context.handler(scheme).default_rounds,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self._waiting,
+            "in_flight": self._in_flight,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99)
+        }
+
+    def shutdown(self) -> None:
+        """Останавливает пул процессов."""
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_engine = LazyObject(
+    lambda: HashingEngine(**get_settings()["hashing"])
+)
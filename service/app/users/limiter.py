@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from math import ceil
+from time import monotonic, time
+
+from fastapi import HTTPException, Request
+
+from database import get_settings, LazyObject
+from dao.dao_models import RateLimitsDAO
+
+
+class MemoryBackend():
+    """
+    Ограничение частоты запросов алгоритмом token bucket в памяти процесса.
+
+    На каждый ключ хранится пара (число токенов, время обновления).
+    Число ключей ограничено max_keys: при переполнении удаляется ключ,
+    к которому дольше всего не обращались. Не разделяется между
+    процессами, поэтому при нескольких процессах лимит действует в
+    каждом из них отдельно.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """
+        Учитывает запрос.
+
+        Args:
+            key: ключ ограничения.
+            limit: число запросов за окно.
+            window: длина окна в секундах.
+
+        Returns:
+            0 - если запрос разрешен, иначе число секунд до следующей
+            попытки.
+        """
+
+        now = monotonic()
+        rate = limit / window
+
+        tokens, updated_at = self._buckets.get(key, (limit, now))
+        tokens = min(limit, tokens + (now - updated_at) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+class DatabaseBackend():
+    """
+    Ограничение частоты запросов фиксированными окнами в таблице
+    rate_limits.
+
+    Разделяется между всеми процессами приложения. Счетчик окна
+    увеличивается одним запросом, старые окна периодически удаляются.
+    Окна хранятся retention секунд - не меньше самого длинного окна
+    лимитов, иначе очистка по короткому окну удалила бы текущие
+    счетчики длинного.
+    """
+
+    def __init__(self, retention: float = 0.0) -> None:
+        self.retention = retention
+        self._purged_at = 0.0
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """
+        Учитывает запрос.
+
+        Args:
+            key: ключ ограничения.
+            limit: число запросов за окно.
+            window: длина окна в секундах.
+
+        Returns:
+            0 - если запрос разрешен, иначе число секунд до следующей
+            попытки.
+
+        Raises:
+            SQLAlchemyError - если возникла ошибка при обновлении счетчика.
+        """
+
+        now = time()
+        window_start = int(now // window * window)
+
+        retention = max(window, self.retention)
+        if now - self._purged_at > retention:
+            self._purged_at = now
+            await RateLimitsDAO.delete_before(int(now - retention))
+
+        count = await RateLimitsDAO.hit(key, window_start)
+        if count <= limit:
+            return 0.0
+        return window_start + window - now
+
+
+class RateLimiter():
+    """
+    Ограничение частоты входа и регистрации по email и по IP-адресу.
+
+    Проверка выполняется до хэширования пароля и запросов к таблице
+    пользователей, поэтому перебор паролей не нагружает процессор.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryBackend | DatabaseBackend,
+        email: tuple[int, float],
+        ip: tuple[int, float]
+    ) -> None:
+        self.backend = backend
+        self.email = email
+        self.ip = ip
+
+    async def _hit(self, key: str, limit: tuple[int, float]) -> None:
+        """
+        Учитывает запрос по ключу.
+
+        Raises:
+            HTTPException(429) - если лимит превышен.
+        """
+
+        number, window = limit
+        if number <= 0:
+            return
+
+        retry_after = await self.backend.hit(key, number, window)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Слишком много попыток, повторите запрос позже",
+                headers={"Retry-After": str(ceil(retry_after))}
+            )
+
+    async def check(self, request: Request, email: str) -> None:
+        """
+        Проверяет лимиты для запроса.
+
+        Сначала проверяется IP-адрес, затем email: запросы с одного адреса
+        по разным email не обходят ограничение.
+
+        Args:
+            request: запрос клиента.
+            email: email из тела запроса.
+
+        Raises:
+            HTTPException(429) - если лимит превышен. Заголовок Retry-After
+            содержит число секунд до следующей попытки.
+        """
+
+        if request.client is not None:
+            await self._hit(f"ip:{request.client.host}", self.ip)
+        await self._hit(f"email:{email.lower()}", self.email)
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "database": DatabaseBackend
+}
+
+
+def create_rate_limiter() -> RateLimiter:
+    """
+    Создает ограничитель частоты запросов по настройкам приложения.
+
+    Returns:
+        Ограничитель частоты запросов.
+    """
+
+    settings = get_settings()["rate_limit"]
+    backend_class = BACKENDS[settings["backend"]]
+    if backend_class is DatabaseBackend:
+        backend = DatabaseBackend(
+            retention=max(settings["email"][1], settings["ip"][1])
+        )
+    else:
+        backend = backend_class(settings["max_keys"])
+
+    return RateLimiter(
+        backend,
+        email=settings["email"],
+        ip=settings["ip"]
+    )
+
+
+rate_limiter = LazyObject(create_rate_limiter)
@@ -0,0 +1,371 @@
+import asyncio
+from hashlib import blake2b
+from time import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import get_settings, LazyObject
+from dao.dao_models import RevokedTokensDAO
+
+
+class BloomFilter():
+    """
+    Фильтр Блума для идентификаторов токенов.
+
+    Если фильтр говорит, что элемента нет, то его точно нет. Если
+    говорит, что есть, то элемент нужно проверить в точном хранилище.
+    """
+
+    def __init__(self, bits: int, hashes: int) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        """Вычисляет номера битов элемента (двойное хэширование)."""
+
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        """Добавляет элемент в фильтр."""
+
+        for position in self._positions(item):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class MemoryBackend():
+    """
+    Локальное хранилище отозванных токенов.
+
+    Не разделяется между процессами, поэтому подходит для тестов и
+    запуска в одном процессе. Каждый токен получает порядковый номер,
+    курсор - номер, с которого нужны токены. Истекшие токены удаляются
+    методом purge.
+    """
+
+    def __init__(self) -> None:
+        # jti -> (порядковый номер, время истечения)
+        self._tokens: dict[str, tuple[int, int]] = {}
+        self._next = 0
+
+    async def publish(self, jti: str, expires_at: int) -> None:
+        """Сохраняет отозванный токен."""
+
+        await self.claim(jti, expires_at)
+
+    async def claim(self, jti: str, expires_at: int) -> bool:
+        """
+        Сохраняет отозванный токен, если его еще нет.
+
+        Returns:
+            True - если токен сохранен этим вызовом.
+        """
+
+        if jti in self._tokens:
+            return False
+
+        self._tokens[jti] = (self._next, expires_at)
+        self._next += 1
+        return True
+
+    async def fetch(self, cursor: int | None) -> tuple[list, int | None]:
+        """Возвращает токены, добавленные начиная с номера cursor."""
+
+        start = cursor or 0
+        tokens = [
+            (jti, expires_at)
+            for jti, (number, expires_at) in self._tokens.items()
+            if number >= start
+        ]
+        return tokens, self._next
+
+    async def purge(self) -> None:
+        """Удаляет истекшие токены."""
+
+        now = time()
+        self._tokens = {
+            jti: token
+            for jti, token in self._tokens.items()
+            if token[1] > now
+        }
+
+
+class DatabaseBackend():
+    """
+    Хранилище отозванных токенов в таблице revoked_tokens.
+
+    Разделяется между всеми процессами приложения: каждый процесс
+    периодически забирает токены, отозванные после прошлой
+    синхронизации, с запасом overlap секунд. Курсор по id не подходит:
+    id выдается до коммита, и строка с меньшим id может стать видна
+    позже строки с большим. Запас также покрывает отставание реплики
+    и расхождение часов процессов. Повторно полученные токены
+    отбрасываются по jti.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, overlap: float = 60) -> None:
+        self.overlap = overlap
+
+    async def publish(self, jti: str, expires_at: int) -> None:
+        """Сохраняет отозванный токен."""
+
+        await RevokedTokensDAO.add_token(jti=jti, expires_at=expires_at)
+
+    async def claim(self, jti: str, expires_at: int) -> bool:
+        """
+        Сохраняет отозванный токен, если его еще нет.
+
+        Returns:
+            True - если токен сохранен этим вызовом, а не другим
+            процессом или запросом.
+        """
+
+        return await RevokedTokensDAO.claim_token(
+            jti=jti, 
+            expires_at=expires_at
+        )
+
+    async def fetch(self, cursor: int | None) -> tuple[list, int | None]:
+        """
+        Возвращает еще не истекшие токены, отозванные за overlap секунд
+        до cursor и позже.
+
+        Курсор - время начала прошлой синхронизации (unix). Без курсора
+        возвращаются все еще не истекшие токены.
+        """
+
+        started_at = int(time())
+        since = None if cursor is None else int(cursor - self.overlap)
+
+        tokens = []
+        after_id = None
+        while True:
+            page = await RevokedTokensDAO.find_tokens(
+                since=since,
+                after_id=after_id,
+                limit=self.batch_size
+            )
+            tokens.extend((token.jti, token.expires_at) for token in page)
+            if page:
+                after_id = page[-1].id
+            if len(page) < self.batch_size:
+                return tokens, started_at
+
+    async def purge(self) -> None:
+        """Удаляет истекшие токены из базы данных."""
+
+        await RevokedTokensDAO.delete_expired()
+
+
+class RevocationStore():
+    """
+    Список отозванных токенов в памяти процесса.
+
+    Проверка выполняется по словарю jti -> exp без обращения к базе
+    данных. Запись хранится только до истечения самого токена.
+    Изменения из других процессов подтягиваются из backend
+    методом sync.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryBackend | DatabaseBackend,
+        bloom_bits: int = 0,
+        bloom_hashes: int = 7,
+        purge_interval: float = 3600
+    ) -> None:
+        self.backend = backend
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self.purge_interval = purge_interval
+
+        self._tokens: dict[str, int] = {}
+        self._bloom = self._new_bloom()
+        self._cursor: int | None = None
+        self._purged_at = time()
+
+    def _new_bloom(self) -> BloomFilter | None:
+        """Создает пустой фильтр Блума, если он включен."""
+
+        if self.bloom_bits <= 0:
+            return None
+        return BloomFilter(self.bloom_bits, self.bloom_hashes)
+
+    def _add_local(self, jti: str, expires_at: int) -> None:
+        """Добавляет токен в локальный список."""
+
+        if jti in self._tokens:
+            return
+
+        self._tokens[jti] = expires_at
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str | None) -> bool:
+        """
+        Проверяет, отозван ли токен.
+
+        Args:
+            jti: идентификатор токена.
+
+        Returns:
+            True - если токен отозван и еще не истек.
+        """
+
+        if jti is None:
+            return False
+        if self._bloom is not None and jti not in self._bloom:
+            return False
+
+        expires_at = self._tokens.get(jti)
+        return expires_at is not None and expires_at > time()
+
+    async def revoke(self, jti: str | None, expires_at: int) -> None:
+        """
+        Отзывает токен.
+
+        Args:
+            jti: идентификатор токена.
+            expires_at: время истечения токена (unix-время).
+
+        Raises:
+            SQLAlchemyError - если не удалось сохранить токен в базу данных.
+        """
+
+        if jti is None or self.is_revoked(jti):
+            return
+
+        self._add_local(jti, expires_at)
+        await self.backend.publish(jti, expires_at)
+
+    async def claim(self, jti: str | None, expires_at: int) -> bool:
+        """
+        Отзывает токен, если он еще не отозван.
+
+        Используется для одноразовых токенов: из одновременных вызовов
+        с одним jti, в том числе в разных процессах, True получает
+        только один.
+
+        Args:
+            jti: идентификатор токена.
+            expires_at: время истечения токена (unix-время).
+
+        Returns:
+            True - если токен отозван этим вызовом.
+
+        Raises:
+            SQLAlchemyError - если не удалось сохранить токен в базу данных.
+        """
+
+        if jti is None or self.is_revoked(jti):
+            return False
+
+        claimed = await self.backend.claim(jti, expires_at)
+        self._add_local(jti, expires_at)
+        return claimed
+
+    async def sync(self) -> None:
+        """
+        Подтягивает токены, отозванные другими процессами, и удаляет
+        истекшие.
+
+        Истекшие токены удаляются из хранилища не чаще, чем раз в
+        purge_interval секунд: очистку запускает каждый процесс.
+        """
+
+        tokens, self._cursor = await self.backend.fetch(self._cursor)
+        for jti, expires_at in tokens:
+            self._add_local(jti, expires_at)
+
+        now = time()
+        expired = [
+            jti for jti, expires_at in self._tokens.items()
+            if expires_at <= now
+        ]
+        if expired:
+            for jti in expired:
+                del self._tokens[jti]
+
+            # Из фильтра Блума нельзя удалить элемент, поэтому он
+            # перестраивается
+            self._bloom = self._new_bloom()
+            if self._bloom is not None:
+                for jti in self._tokens:
+                    self._bloom.add(jti)
+
+        if now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            await self.backend.purge()
+
+    async def run_sync(self, interval: float) -> None:
+        """
+        Периодически синхронизирует список отозванных токенов.
+
+        Args:
+            interval: интервал синхронизации в секундах.
+        """
+
+        while True:
+            try:
+                await self.sync()
+            except SQLAlchemyError:
+                # База временно недоступна, повторим на следующем шаге
+                pass
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        """
+        Выводит статистику списка отозванных токенов.
+
+        Returns:
+            Словарь с числом токенов и настройками фильтра Блума.
+        """
+
+        return {
+            "tokens": len(self._tokens),
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": self.bloom_hashes
+        }
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "database": DatabaseBackend
+}
+
+def create_revocation_store() -> RevocationStore:
+    """
+    Создает список отозванных токенов по настройкам приложения.
+
+    Returns:
+        Список отозванных токенов.
+    """
+
+    settings = get_settings()["revocation"]
+    backend_class = BACKENDS[settings["backend"]]
+    if backend_class is DatabaseBackend:
+        backend = DatabaseBackend(overlap=settings["sync_overlap"])
+    else:
+        backend = backend_class()
+
+    return RevocationStore(
+        backend,
+        bloom_bits=settings["bloom_bits"],
+        bloom_hashes=settings["bloom_hashes"],
+        purge_interval=settings["purge_interval"]
+    )
+
+
+revocation_store = LazyObject(create_revocation_store)
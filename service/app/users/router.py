@@ -1,52 +1,60 @@
-from fastapi import APIRouter, Response, Request, HTTPException
+from fastapi import APIRouter, Response, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import EmailStr
 
+from typing import Literal
+
 from users.validation import SUser_registration, SUser_authentication
 from users.validation import SUser_update_data
-from users.auth import hash_password, create_access_token, require_role
-from users.auth import decode_access_token
+from users.validation import SUsers_selection, SUsers_role_change
+from users.auth import hash_password, issue_tokens, require_role
+from users.auth import decode_access_token, verify_password
+from users.auth import revoke_tokens, refresh_access_token
 from users.admin import AdminRules
-from migration.models import Users
+from users.hashing import hashing_engine
+from users.bulk import import_users, export_users
+from users.revocation import revocation_store
+from users.limiter import rate_limiter
 from dao.dao_models import UsersDAO
+from cache import principal_cache, token_cache, lookup_flight
+from database import get_pool_stats, get_settings
 
 
 router = APIRouter(prefix="/auth", tags=['Auth'])
 
 
 @router.post("/register/", summary="Регистрация нового пользователя")
-def user_register(data: SUser_registration, response: Response) -> dict:
+async def user_register(
+    data: SUser_registration,
+    response: Response,
+    request: Request
+) -> dict:
     """Регистрирует нового пользователя в базе данных."""
+
+    # Лимит проверяется до хэширования пароля
+    await rate_limiter.check(request, data.email)
     
-    found = UsersDAO.find_user(email=data.email)
-    if isinstance(found, Users):
+    # Хэшируем пароль до запроса, чтобы зарегистрировать за один запрос
+    hashed_password = await hash_password(data.password)
+
+    # Удаленный (неактивный) пользователь восстанавливается с новыми данными
+    user, _ = await UsersDAO.upsert_user(
+        name=data.name, 
+        email=data.email,
+        password=hashed_password,
+        surname=data.surname,
+        middle_name=data.middle_name
+    )
+    if user is None:
         return {"message": "Пользователь с таким email уже зарегистрирован."}
-    
-    # Заменяем пароль на хэшированный
-    data = data.model_copy(update={"password": hash_password(data.password)})
-
-    # Если пользователь не активен, то обновляем уже существующие данные
-    if found:
-        UsersDAO.update_user(
-            email=data.email, 
-            **data.model_dump(exclude={"email", "confirm_password"})
-        )
-    else:
-        UsersDAO.add_user(
-            name=data.name, 
-            email=data.email,
-            password=data.password,
-            surname= data.surname,
-            middle_name=data.middle_name
-        )
 
-    token = create_access_token(data.email)
-    response.set_cookie(key="users_access_token", value=token, httponly=True)
+    issue_tokens(response, data.email, user)
 
     return {"message": "Пользователь успешно зарегистрирован."}
 
 
 @router.post("/logout/", summary="Выход из профиля")
-def user_logout(response: Response, request: Request) -> dict:
+async def user_logout(response: Response, request: Request) -> dict:
     """Разлогинивает пользователя."""
 
     token = request.cookies.get("users_access_token")
@@ -55,13 +63,16 @@ def user_logout(response: Response, request: Request) -> dict:
             status_code=401, 
             detail="Пользователь не авторизован"
         )
+
+    await revoke_tokens(token, request.cookies.get("users_refresh_token"))
     
     response.delete_cookie(key="users_access_token")
+    response.delete_cookie(key="users_refresh_token")
     return {"message": "Пользователь успешно разлогинен."}
 
 
 @router.post("/login/", summary="Аутентификация пользователя")
-def user_login(
+async def user_login(
     data: SUser_authentication,
     response: Response,
     request: Request
@@ -71,15 +82,47 @@ def user_login(
     token = request.cookies.get("users_access_token")
     if token is not None:
         return {"message": "Пользователь уже авторизован."}
+
+    # Лимит проверяется до обращения к базе данных и проверки пароля
+    await rate_limiter.check(request, data.email)
+
+    credentials = await verify_password(data.email, data.password)
+    if credentials is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Неверно введена почта или пароль"
+        )
     
-    token = create_access_token(email=data.email)
-    response.set_cookie(key="users_access_token", value=token, httponly=True)
+    issue_tokens(response, data.email, credentials)
 
     return {"message": "Пользователь успешно вошел в аккаунт."}
 
 
+@router.post("/refresh/", summary="Обновление токена доступа")
+async def user_refresh(request: Request, response: Response) -> dict:
+    """
+    Выдает новый токен доступа по токену обновления.
+
+    Используется в режиме без состояния (TOKEN_STATELESS), где токен
+    доступа живет недолго.
+    """
+
+    token = request.cookies.get("users_refresh_token")
+    if token is None:
+        raise HTTPException(
+            status_code=401, 
+            detail="Пользователь не авторизован"
+        )
+
+    # Старый токен обновления отзывается до выдачи новых
+    email, user = await refresh_access_token(token)
+    issue_tokens(response, email, user)
+
+    return {"message": "Токен успешно обновлен."}
+
+
 @router.post("/delete/", summary="Удаление пользователя")
-def user_delete(request: Request, response: Response) -> dict:
+async def user_delete(request: Request, response: Response) -> dict:
     """Удаляет аккаунт пользователя из базы данных."""
 
     token = request.cookies.get("users_access_token")
@@ -90,14 +133,20 @@ def user_delete(request: Request, response: Response) -> dict:
         )
 
     user_email = decode_access_token(token)
-    UsersDAO.delete_user(user_email)
+    await UsersDAO.delete_user(user_email)
+    await revoke_tokens(token, request.cookies.get("users_refresh_token"))
 
     response.delete_cookie(key="users_access_token")
+    response.delete_cookie(key="users_refresh_token")
     return {"message": "Пользователь успешно удален."}
 
 
 @router.post("/update/", summary="Обновление данные пользователя")
-def user_update(data: SUser_update_data, request: Request) -> dict:
+async def user_update(
+    data: SUser_update_data, 
+    request: Request,
+    response: Response
+) -> dict:
     """Обновляет данные пользователя."""
 
     token = request.cookies.get("users_access_token")
@@ -115,46 +164,184 @@ def user_update(data: SUser_update_data, request: Request) -> dict:
         if data[key] is None:
             del data[key]
 
-    # Хэшируем новый пароль, если он есть
+    # Хэшируем новый пароль, если он есть. Совпадение с текущим паролем
+    # не проверяется: это стоило бы еще одного вызова bcrypt
     if data.get("password") is not None:
-        data["password"] = hash_password(data["password"])
+        data["password"] = await hash_password(data["password"])
+
+    # Измененный пользователь возвращается тем же запросом (RETURNING)
+    user = await UsersDAO.update_user(email=user_email, **data)
+    if user is None:
+        return {"message": "Данные не изменились."}
 
-    UsersDAO.update_user(email=user_email, **data)
+    # Изменение увеличило версию токенов: выдаем токены с новой версией,
+    # а ранее выданные токены обновления перестают действовать
+    if get_settings()["tokens"]["stateless"]:
+        issue_tokens(response, user_email, user)
 
     return {"message": "Данные успешно изменены."}
 
 
 @router.get("/data/", summary="Получение данных о пользователе")
 @require_role(role="admin")
-def user_data(email: EmailStr, request: Request) -> dict:
+async def user_data(email: EmailStr, request: Request) -> dict:
     """Показывает данные о пользователе."""
 
-    user = UsersDAO.find_user(email=email)
+    user = await UsersDAO.find_user(email=email)
     if user == False:
         return {"message": "Такого пользователя нет"}
     
     return user.get_dict()
 
 
+@router.get("/users", summary="Постраничный список пользователей")
+@require_role(role="admin")
+async def users_list(
+    request: Request,
+    after_id: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    role: str | None = None,
+    is_active: bool | None = None
+) -> dict:
+    """
+    Показывает страницу пользователей, упорядоченных по id.
+
+    Для следующей страницы нужно передать next_after_id из ответа
+    в параметре after_id.
+    """
+
+    # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+    users = await UsersDAO.list_users(
+        after_id=after_id,
+        limit=limit + 1,
+        role=role,
+        is_active=is_active
+    )
+    has_next = len(users) > limit
+    users = users[:limit]
+
+    return {
+        "users": [user.get_dict() for user in users],
+        "next_after_id": users[-1].id if has_next else None
+    }
+
+
+@router.post("/users/import", summary="Массовый импорт пользователей")
+@require_role(role="admin")
+async def users_import(request: Request) -> dict:
+    """
+    Импортирует пользователей из тела запроса в формате NDJSON или CSV.
+
+    Формат определяется по заголовку Content-Type (text/csv для CSV).
+    """
+
+    content_type = request.headers.get("content-type", "")
+    file_format = "csv" if "csv" in content_type else "ndjson"
+
+    return await import_users(request.stream(), file_format)
+
+
+@router.get("/users/export", summary="Массовый экспорт пользователей")
+@require_role(role="admin")
+async def users_export(
+    request: Request,
+    file_format: Literal["ndjson", "csv"] = "ndjson"
+) -> StreamingResponse:
+    """Выгружает всех пользователей в формате NDJSON или CSV."""
+
+    media_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_users(file_format), media_type=media_type)
+
+
+async def bulk_update(selection: SUsers_selection, **values) -> dict:
+    """Изменяет выбранных пользователей и возвращает их id."""
+
+    ids = await UsersDAO.bulk_update(
+        values,
+        chunk_size=get_settings()["bulk"]["update_chunk_size"],
+        emails=selection.emails,
+        role=selection.role,
+        is_active=selection.is_active,
+        email_domain=selection.email_domain
+    )
+    return {"updated": len(ids), "ids": ids}
+
+
+@router.post("/users/deactivate", summary="Массовое удаление пользователей")
+@require_role(role="admin")
+async def users_deactivate(data: SUsers_selection, request: Request) -> dict:
+    """Деактивирует пользователей по списку почт или по фильтру."""
+
+    return await bulk_update(data, is_active=False)
+
+
+@router.post("/users/reactivate", summary="Массовое восстановление")
+@require_role(role="admin")
+async def users_reactivate(data: SUsers_selection, request: Request) -> dict:
+    """Восстанавливает пользователей по списку почт или по фильтру."""
+
+    return await bulk_update(data, is_active=True)
+
+
+@router.post("/users/role", summary="Массовая смена роли пользователей")
+@require_role(role="admin")
+async def users_change_role(
+    data: SUsers_role_change, 
+    request: Request
+) -> dict:
+    """Меняет роль пользователей по списку почт или по фильтру."""
+
+    return await bulk_update(data, role=data.new_role)
+
+
 @router.get("/rules", summary="Показ правил админа")
 @require_role(role="admin")
-def get_admin_rules(request: Request) -> dict:
+async def get_admin_rules(request: Request) -> dict:
     """Показывает правила админа."""
 
-    return AdminRules.rules
+    return await AdminRules.get_rules()
 
 
 @router.post("/rules_add", summary="Добавление правила в список правил админа")
 @require_role(role="admin")
-def add_admin_rules(new_rules: str, request: Request) -> dict:
+async def add_admin_rules(new_rules: str, request: Request) -> dict:
     """Добавляет правило в список правил админа."""
 
-    return AdminRules.add_rules(new_rule=new_rules)
+    return await AdminRules.add_rules(new_rule=new_rules)
 
 
 @router.post("/rules_del", summary="Удаление правила из списка правил админа")
 @require_role(role="admin")
-def del_admin_rules(number_rule: int, request: Request) -> dict:
+async def del_admin_rules(number_rule: int, request: Request) -> dict:
     """Удаляет правило из списка правил админа."""
 
-    return AdminRules.del_rules(number_rule=number_rule)
\ No newline at end of file
+    return await AdminRules.del_rules(number_rule=number_rule)
+
+
+@router.get("/hashing_stats", summary="Статистика пула хэширования паролей")
+@require_role(role="admin")
+async def get_hashing_stats(request: Request) -> dict:
+    """Показывает нагрузку на пул хэширования паролей."""
+
+    return hashing_engine.stats()
+
+
+@router.get("/cache_stats", summary="Статистика кэшей авторизации")
+@require_role(role="admin")
+async def get_cache_stats(request: Request) -> dict:
+    """Показывает заполненность и эффективность кэшей авторизации."""
+
+    return {
+        "principal": principal_cache.stats(),
+        "token": token_cache.stats(),
+        "revoked_tokens": revocation_store.stats(),
+        "lookups": lookup_flight.stats()
+    }
+
+
+@router.get("/pool_stats", summary="Состояние пула соединений с базой")
+@require_role(role="admin")
+async def get_db_pool_stats(request: Request) -> dict:
+    """Показывает занятые, свободные и дополнительные соединения с базой."""
+
+    return get_pool_stats()
\ No newline at end of file
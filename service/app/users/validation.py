@@ -1,15 +1,18 @@
-from pydantic import BaseModel, EmailStr, model_validator
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from pydantic import AfterValidator
 from fastapi import Form
 
-from typing import Optional
+from typing import Optional, Literal, Annotated
 
-from users.auth import verify_password
+
+# Почта без учета регистра: в токены и кэши попадает один вариант записи
+Email = Annotated[EmailStr, AfterValidator(str.lower)]
 
 
 class SUser_registration(BaseModel):
     """Проверка валидности данных при регистрации."""
     
-    email: EmailStr = Form(..., description="Электронная почта.")
+    email: Email = Form(..., description="Электронная почта.")
     name: str = Form(..., description="Имя пользователя.")
     surname: str = Form(..., description="Фамилия пользователя.")
     middle_name: str = Form(..., description="Отчество пользователя.")
@@ -38,21 +41,18 @@ class SUser_registration(BaseModel):
 class SUser_authentication(BaseModel):
     """Проверка валидности данных при аутентификации."""
 
-    email: EmailStr = Form(..., description="Электронная почта.")
+    email: Email = Form(..., description="Электронная почта.")
     password: str = Form(..., min_length=8, description="Пароль.")
 
-    @model_validator(mode='after')
-    def auth_verify_password(self):
-        """
-        Проверяет, соответствует ли введённый пароль сохранённому хэшу.
 
-        Raises:
-            ValueError - если пароль не подходит или пользователя нет.
-        """
+class SUser_import(BaseModel):
+    """Проверка валидности строки массового импорта пользователей."""
 
-        if not verify_password(self.email, self.password):
-            raise ValueError("Неверно введена почта или пароль")
-        return self
+    email: Email
+    name: str
+    surname: str
+    middle_name: str
+    password: str = Field(..., min_length=8)
 
 
 class SUser_update_data(BaseModel):
@@ -74,4 +74,55 @@ class SUser_update_data(BaseModel):
         None, 
         min_length=8, 
         description="Новый пароль."
-    )
\ No newline at end of file
+    )
+
+
+class SUsers_selection(BaseModel):
+    """
+    Проверка валидности выбора пользователей для массового изменения.
+
+    Нужно указать список почт или хотя бы один фильтр, чтобы случайно
+    не изменить всех пользователей.
+    """
+
+    emails: Optional[list[Email]] = Field(
+        None, 
+        description="Список почт пользователей."
+    )
+    role: Optional[Literal["admin", "user"]] = Field(
+        None, 
+        description="Фильтр по роли."
+    )
+    is_active: Optional[bool] = Field(
+        None, 
+        description="Фильтр по активности."
+    )
+    email_domain: Optional[str] = Field(
+        None, 
+        min_length=1, 
+        description="Фильтр по домену почты."
+    )
+
+    @model_validator(mode='after')
+    def selection_not_empty(self):
+        """
+        Проверяет, что пользователи выбраны.
+
+        Raises:
+            ValueError - если не задан ни список почт, ни фильтр.
+        """
+
+        filters = (self.emails, self.role, self.is_active, self.email_domain)
+        if all(value is None for value in filters):
+            raise ValueError("Укажите список почт или фильтр")
+
+        return self
+
+
+class SUsers_role_change(SUsers_selection):
+    """Проверка валидности массовой смены роли."""
+
+    new_role: Literal["admin", "user"] = Field(
+        ..., 
+        description="Новая роль пользователей."
+    )
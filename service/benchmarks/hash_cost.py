@@ -0,0 +1,47 @@
+"""
+Печатает время хэширования пароля для каждой стоимости.
+
+Помогает выбрать HASH_COST (или HASH_TARGET_MS для калибровки)
+под конкретный сервер.
+
+Запуск из каталога service:
+    python benchmarks/hash_cost.py [--scheme bcrypt] [--costs 8-14]
+"""
+
+import argparse
+
+from common import setup_environment
+
+setup_environment()
+
+from users.hashing import COST_RANGES, measure_cost  # noqa: E402
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scheme", choices=COST_RANGES, default="bcrypt")
+    parser.add_argument("--costs", default=None, help="диапазон, например 8-14")
+    parser.add_argument("--memory-cost", type=int, default=None)
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.costs:
+        low, high = (int(value) for value in args.costs.split("-"))
+        costs = range(low, high + 1)
+    else:
+        costs = COST_RANGES[args.scheme]
+
+    print(f"{'cost':>6} {'ms/hash':>12}")
+    for cost in costs:
+        latency = measure_cost(args.scheme, cost, args.memory_cost, args.number)
+        print(f"{cost:>6} {latency:>12.2f}")
+
+        # Дальше время только растет
+        if latency > 5000:
+            break
+
+
+if __name__ == "__main__":
+    main()
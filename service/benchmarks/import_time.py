@@ -0,0 +1,68 @@
+"""
+Замеряет время импорта приложения.
+
+Модуль main импортируется в отдельном процессе с python -X importtime.
+Печатается общее время и самые долгие модули. Скрипт завершается
+с кодом 1, если импорт дольше бюджета. Бюджет (с запасом для CI) и
+отсутствие побочных эффектов импорта проверяет tests/test_import.py.
+
+Запуск из каталога service:
+    python benchmarks/import_time.py [--budget-ms MS] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from common import APP_DIR, setup_environment
+
+
+def run_import() -> list[tuple[int, str]]:
+    """
+    Импортирует main в отдельном процессе.
+
+    Returns:
+        Список (накопленное время в мкс, модуль).
+    """
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.append((int(cumulative), name.strip()))
+
+    return modules
+
+
+def main() -> None:
+    """Запускает проверку и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_environment()
+    modules = run_import()
+
+    total_ms = dict((name, us) for us, name in modules)["main"] / 1000
+    print(f"import main: {total_ms:10.1f} ms (budget {args.budget_ms} ms)")
+    for us, name in sorted(modules, reverse=True)[1:args.top + 1]:
+        print(f"  {us / 1000:10.1f} ms  {name}")
+
+    sys.exit(1 if total_ms > args.budget_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
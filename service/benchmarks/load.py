@@ -0,0 +1,391 @@
+"""
+Нагрузочный бенчмарк эндпоинтов /auth внутри одного процесса.
+
+Приложение из app/main.py запускается через ASGI-транспорт httpx без
+сети, база данных - локальная SQLite (DB_URL из common.py). Несколько
+виртуальных пользователей параллельно выполняют смесь запросов
+register, login, update, data и rules.
+
+В результате печатаются запросы в секунду, p50/p95/p99 по каждой
+операции и разбивка времени запроса по фазам: база данных, ожидание
+свободного процесса хэширования (hash_wait), хэширование паролей и JWT.
+Фазы берутся из заголовка Server-Timing (SERVER_TIMING включается
+здесь), остальное время - маршрутизация, валидация и сериализация. Результат сохраняется в JSON, чтобы сравнивать запуски
+между собой.
+
+Если доля ответов с ошибкой (4xx/5xx) больше --max-error-rate, то
+скрипт печатает предупреждение и завершается с кодом 1: пропускная
+способность из ошибочных ответов ничего не говорит о сервисе.
+
+Запуск из каталога service:
+    python benchmarks/load.py [--concurrency 16] [--duration 10]
+        [--mix register=1,login=2,update=2,data=3,rules=2]
+        [--max-error-rate 0.01]
+        [--output benchmarks/results/run.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import platform
+import sys
+from collections import Counter
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from time import perf_counter
+
+from common import setup_environment
+
+setup_environment()
+os.environ.setdefault("SERVER_TIMING", "true")
+
+import httpx  # noqa: E402
+
+from main import app, lifespan  # noqa: E402
+
+
+PASSWORD = "benchmark-password"
+DEFAULT_MIX = "register=1,login=2,update=2,data=3,rules=2"
+PHASES = ("db", "hash_wait", "hash", "jwt")
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """Разбирает веса операций из строки вида login=2,data=3."""
+
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    """
+    Разбирает заголовок Server-Timing вида "db;dur=1.2, total;dur=3.4".
+
+    Returns:
+        Словарь фаза -> длительность в миллисекундах.
+    """
+
+    timings = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.startswith("dur="):
+            timings[name] = float(params[4:])
+    return timings
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Вычисляет перцентиль в миллисекундах."""
+
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * p))
+    return round(values[index] * 1000, 3)
+
+
+class LoadRunner():
+    """Виртуальные пользователи, выполняющие смесь запросов."""
+
+    def __init__(self, client: httpx.AsyncClient, users: int) -> None:
+        self.client = client
+        self.users = users
+        self.emails: list[str] = []
+        self.tokens: dict[str, str] = {}
+        self.admin_token = ""
+        self._ids = count()
+
+    def _new_email(self) -> str:
+        return f"user{next(self._ids)}-{random.getrandbits(32)}@example.com"
+
+    async def _request(self, method: str, url: str, token: str = "", **kwargs):
+        """Выполняет запрос с токеном пользователя в cookie."""
+
+        headers = {"Cookie": f"users_access_token={token}"} if token else {}
+        response = await self.client.request(
+            method, url, headers=headers, **kwargs
+        )
+        self.client.cookies.clear()
+        return response
+
+    async def register(self) -> httpx.Response:
+        email = self._new_email()
+        response = await self._request("POST", "/auth/register/", json={
+            "email": email,
+            "name": "Bench",
+            "surname": "Bench",
+            "middle_name": "Bench",
+            "password": PASSWORD,
+            "confirm_password": PASSWORD
+        })
+        token = response.cookies.get("users_access_token")
+        if token:
+            self.emails.append(email)
+            self.tokens[email] = token
+        return response
+
+    async def login(self) -> httpx.Response:
+        email = random.choice(self.emails)
+        return await self._request("POST", "/auth/login/", json={
+            "email": email,
+            "password": PASSWORD
+        })
+
+    async def update(self) -> httpx.Response:
+        email = random.choice(self.emails)
+        return await self._request(
+            "POST", 
+            "/auth/update/", 
+            token=self.tokens[email],
+            json={"name": f"Bench{random.randint(0, 1000)}"}
+        )
+
+    async def data(self) -> httpx.Response:
+        return await self._request(
+            "GET",
+            "/auth/data/",
+            token=self.admin_token,
+            params={"email": random.choice(self.emails)}
+        )
+
+    async def rules(self) -> httpx.Response:
+        return await self._request(
+            "GET", 
+            "/auth/rules", 
+            token=self.admin_token
+        )
+
+    async def seed(self) -> None:
+        """Регистрирует администратора и начальных пользователей."""
+
+        await self.register()
+        self.admin_token = self.tokens[self.emails[0]]
+        for _ in range(self.users):
+            await self.register()
+
+    async def run(
+        self, 
+        mix: dict[str, int], 
+        concurrency: int, 
+        duration: float
+    ) -> dict[str, dict]:
+        """
+        Выполняет смесь запросов заданное время.
+
+        Returns:
+            Словарь операция -> задержки, коды ответов и время фаз
+            каждого запроса из Server-Timing.
+        """
+
+        operations = list(mix)
+        weights = [mix[name] for name in operations]
+        results = {
+            name: {
+                "latencies": [], 
+                "errors": 0, 
+                "statuses": Counter(),
+                "timings": []
+            } 
+            for name in operations
+        }
+        deadline = perf_counter() + duration
+
+        async def worker() -> None:
+            while perf_counter() < deadline:
+                name = random.choices(operations, weights)[0]
+                start = perf_counter()
+                response = await getattr(self, name)()
+                elapsed = perf_counter() - start
+
+                results[name]["latencies"].append(elapsed)
+                results[name]["statuses"][response.status_code] += 1
+                results[name]["timings"].append(
+                    parse_server_timing(response.headers.get("server-timing"))
+                )
+                if response.status_code >= 400:
+                    results[name]["errors"] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
+
+
+def breakdown(timings: list[dict[str, float]]) -> dict[str, float]:
+    """
+    Считает среднее время фаз одного запроса операции.
+
+    Returns:
+        Словарь фаза -> среднее время в миллисекундах, включая total
+        (время в приложении) и other (total без фаз).
+    """
+
+    if not timings:
+        return {}
+
+    mean = {
+        phase: round(
+            sum(timing.get(phase, 0.0) for timing in timings) / len(timings),
+            3
+        )
+        for phase in (*PHASES, "total")
+    }
+    mean["other"] = round(
+        max(mean["total"] - sum(mean[phase] for phase in PHASES), 0.0),
+        3
+    )
+    return mean
+
+
+def summarize(results: dict[str, dict], duration: float) -> dict:
+    """Считает итоговые показатели по операциям."""
+
+    operations = {}
+    total = 0
+    errors = 0
+    for name, result in results.items():
+        latencies = result["latencies"]
+        total += len(latencies)
+        errors += result["errors"]
+        operations[name] = {
+            "requests": len(latencies),
+            "errors": result["errors"],
+            "statuses": {
+                str(status): number 
+                for status, number in sorted(result["statuses"].items())
+            },
+            "rps": round(len(latencies) / duration, 2),
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "phases_ms": breakdown(result["timings"])
+        }
+
+    all_latencies = [
+        latency 
+        for result in results.values() 
+        for latency in result["latencies"]
+    ]
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / duration, 2),
+        "p50_ms": percentile(all_latencies, 0.50),
+        "p95_ms": percentile(all_latencies, 0.95),
+        "p99_ms": percentile(all_latencies, 0.99),
+        "operations": operations
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    """Запускает приложение, готовит данные и выполняет замер."""
+
+    mix = parse_mix(args.mix)
+    stages = {}
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, 
+            base_url="http://bench"
+        ) as client:
+            runner = LoadRunner(client, args.users)
+
+            start = perf_counter()
+            await runner.seed()
+            stages["seed_s"] = round(perf_counter() - start, 3)
+
+            start = perf_counter()
+            await runner.run(mix, args.concurrency, args.warmup)
+            stages["warmup_s"] = round(perf_counter() - start, 3)
+
+            start = perf_counter()
+            results = await runner.run(mix, args.concurrency, args.duration)
+            stages["measure_s"] = round(perf_counter() - start, 3)
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "users": args.users,
+            "mix": mix,
+            "db_url": os.environ["DB_URL"]
+        },
+        "stages": stages,
+        **summarize(results, stages["measure_s"])
+    }
+
+
+def main() -> None:
+    """Разбирает аргументы, запускает бенчмарк и сохраняет результат."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, 
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # Каждый запуск начинается с пустой локальной базы
+    database = Path(os.environ["DB_URL"].split(":///", 1)[-1])
+    if os.environ["DB_URL"].startswith("sqlite") and database.exists():
+        database.unlink()
+
+    report = asyncio.run(benchmark(args))
+
+    print(f"total: {report['requests']} requests, {report['rps']} rps, "
+          f"p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms, "
+          f"p99 {report['p99_ms']} ms")
+    print(f"stages: {report['stages']}")
+    print(f"{'operation':<10} {'requests':>9} {'errors':>7} {'rps':>9} "
+          f"{'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+    for name, result in report["operations"].items():
+        print(f"{name:<10} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['rps']:>9} {result['p50_ms']:>9} "
+              f"{result['p95_ms']:>9} {result['p99_ms']:>9}")
+
+    columns = (*PHASES, "other", "total")
+    print("mean time per request by phase, ms (Server-Timing):")
+    print(f"{'operation':<10} " + " ".join(f"{name:>9}" for name in columns))
+    for name, result in report["operations"].items():
+        phases = result["phases_ms"]
+        print(f"{name:<10} " + " ".join(
+            f"{phases.get(phase, 0.0):>9}" for phase in columns
+        ))
+
+    output = Path(args.output) if args.output else (
+        Path(__file__).parent / "results" 
+        / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"saved: {output}")
+
+    if report["error_rate"] > args.max_error_rate:
+        statuses = {
+            name: result["statuses"] 
+            for name, result in report["operations"].items() 
+            if result["errors"]
+        }
+        print(
+            f"WARNING: error rate {report['error_rate']:.2%} exceeds "
+            f"{args.max_error_rate:.2%}, statuses: {statuses}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Сравнивает запросы UsersDAO, построенные при каждом вызове, с
+заранее построенными запросами с параметрами.
+
+Печатает два замера:
+- построение запроса и ключа кэша компиляции SQLAlchemy без базы;
+- полный вызов DAO на локальной SQLite (поиск по email и
+  деактивация пользователя).
+
+Запуск из каталога service:
+    python benchmarks/prepared_statements.py [--number N]
+"""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from time import perf_counter
+
+from common import setup_environment, measure
+
+setup_environment()
+
+from sqlalchemy import select  # noqa: E402
+
+from database import create_tables, dispose_engines  # noqa: E402
+from database import read_session  # noqa: E402
+from dao.dao_models import UsersDAO  # noqa: E402
+from migration.models import Base, Users  # noqa: E402
+
+
+EMAIL = "prepared@example.com"
+
+
+def build_adhoc():
+    """Строит запрос при вызове и его ключ кэша."""
+
+    statement = select(Users).where(Users.email == EMAIL)
+    return statement._generate_cache_key()
+
+
+def build_prepared():
+    """Берет заранее построенный запрос и его ключ кэша."""
+
+    return UsersDAO._select_by_email._generate_cache_key()
+
+
+async def find_adhoc() -> Users | None:
+    """Ищет пользователя запросом, построенным при вызове."""
+
+    async with read_session() as session:
+        result = await session.execute(
+            select(Users).where(Users.email == EMAIL)
+        )
+        return result.scalars().first()
+
+
+async def measure_async(func, number: int) -> float:
+    """
+    Измеряет среднее время одного вызова корутины.
+
+    Returns:
+        Лучшее из трех замеров среднее время вызова в микросекундах.
+    """
+
+    best = None
+    for _ in range(3):
+        start = perf_counter()
+        for _ in range(number):
+            await func()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number * 1_000_000
+
+
+async def measure_dao(number: int) -> dict[str, float]:
+    """Замеряет вызовы DAO на локальной базе."""
+
+    await create_tables(Base.metadata)
+    await UsersDAO.add_user(
+        name="Prepared",
+        email=EMAIL,
+        password="not-a-real-hash",
+        surname="Prepared",
+        middle_name="Prepared"
+    )
+
+    results = {
+        "find adhoc": await measure_async(find_adhoc, number),
+        "find prepared": await measure_async(
+            lambda: UsersDAO._find_prepared(
+                UsersDAO._select_by_email,
+                email=EMAIL
+            ),
+            number
+        ),
+        "deactivate adhoc": await measure_async(
+            lambda: UsersDAO._update_data(
+                Users.email == EMAIL,
+                is_active=False
+            ),
+            number
+        ),
+        "deactivate prepared": await measure_async(
+            lambda: UsersDAO._execute_prepared(
+                UsersDAO._deactivate,
+                user_email=EMAIL
+            ),
+            number
+        )
+    }
+
+    await dispose_engines()
+    return results
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Каждый запуск начинается с пустой локальной базы
+    database = Path(os.environ["DB_URL"].split(":///", 1)[-1])
+    if os.environ["DB_URL"].startswith("sqlite") and database.exists():
+        database.unlink()
+
+    adhoc = measure(build_adhoc, args.number * 10)
+    prepared = measure(build_prepared, args.number * 10)
+    print("statement construction + cache key:")
+    print(f"  adhoc:    {adhoc:10.2f} us/call")
+    print(f"  prepared: {prepared:10.2f} us/call")
+
+    print("DAO call on local SQLite:")
+    for name, value in asyncio.run(measure_dao(args.number)).items():
+        print(f"  {name:<20} {value:10.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Сравнивает одновременные одинаковые поиски пользователя с объединением
+запросов (singleflight) и без него.
+
+Запускается --concurrency одновременных вызовов UsersDAO.find_user для
+одного пользователя, и так --rounds раз. Печатает число SQL-запросов,
+число объединенных вызовов и время одного раунда.
+
+Запуск из каталога service:
+    python benchmarks/singleflight.py [--concurrency N] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from time import perf_counter
+
+from common import setup_environment
+
+setup_environment()
+
+from sqlalchemy import event  # noqa: E402
+
+from cache import lookup_flight  # noqa: E402
+from database import create_tables, dispose_engines, get_engine  # noqa: E402
+from dao.dao_models import UsersDAO  # noqa: E402
+from migration.models import Base  # noqa: E402
+
+
+EMAIL = "singleflight@example.com"
+
+
+async def measure_rounds(concurrency: int, rounds: int) -> dict:
+    """
+    Выполняет раунды одновременных поисков.
+
+    Returns:
+        Словарь с числом SQL-запросов, объединенных вызовов и средним
+        временем раунда в миллисекундах.
+    """
+
+    queries = 0
+
+    def count_query(*args) -> None:
+        nonlocal queries
+        queries += 1
+
+    engine = get_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", count_query)
+    coalesced = lookup_flight.coalesced
+
+    start = perf_counter()
+    for _ in range(rounds):
+        users = await asyncio.gather(
+            *(UsersDAO.find_user(email=EMAIL) for _ in range(concurrency))
+        )
+        assert all(user.email == EMAIL for user in users)
+    elapsed = perf_counter() - start
+
+    event.remove(engine, "before_cursor_execute", count_query)
+
+    return {
+        "queries": queries,
+        "coalesced": lookup_flight.coalesced - coalesced,
+        "round_ms": elapsed / rounds * 1000
+    }
+
+
+async def run(concurrency: int, rounds: int) -> dict[str, dict]:
+    """Замеряет поиски без объединения и с ним."""
+
+    await create_tables(Base.metadata)
+    await UsersDAO.add_user(
+        name="Singleflight",
+        email=EMAIL,
+        password="not-a-real-hash",
+        surname="Singleflight",
+        middle_name="Singleflight"
+    )
+
+    results = {}
+    for enabled in (False, True):
+        lookup_flight.enabled = enabled
+        name = "singleflight" if enabled else "direct"
+        results[name] = await measure_rounds(concurrency, rounds)
+
+    await dispose_engines()
+    return results
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    # Каждый запуск начинается с пустой локальной базы
+    database = Path(os.environ["DB_URL"].split(":///", 1)[-1])
+    if os.environ["DB_URL"].startswith("sqlite") and database.exists():
+        database.unlink()
+
+    results = asyncio.run(run(args.concurrency, args.rounds))
+
+    print(f"{args.rounds} rounds of {args.concurrency} concurrent find_user:")
+    for name, result in results.items():
+        print(
+            f"  {name:<13} queries {result['queries']:6}  "
+            f"coalesced {result['coalesced']:6}  "
+            f"{result['round_ms']:8.2f} ms/round"
+        )
+
+
+if __name__ == "__main__":
+    main()
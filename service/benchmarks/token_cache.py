@@ -0,0 +1,37 @@
+"""
+Сравнивает расшифровку токена с кэшем проверенных токенов и без него.
+
+Запуск из каталога service:
+    python benchmarks/token_cache.py [--number N]
+"""
+
+import argparse
+
+from common import setup_environment, measure
+
+setup_environment()
+
+from users.auth import create_access_token, _decode_token  # noqa: E402
+from users.auth import decode_token_claims  # noqa: E402
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=10_000)
+    args = parser.parse_args()
+
+    token = create_access_token("bench@example.com")
+    decode_token_claims(token)
+
+    uncached = measure(lambda: _decode_token(token), args.number)
+    cached = measure(lambda: decode_token_claims(token), args.number)
+
+    print(f"uncached: {uncached:10.2f} us/call")
+    print(f"cached:   {cached:10.2f} us/call")
+    print(f"speedup:  {uncached / cached:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Сравнивает скорость кодеков токенов для разных библиотек и алгоритмов.
+
+Для каждой пары (JWT_BACKEND, алгоритм) печатает число операций
+encode и decode в секунду. Строка jose-raw показывает прежний способ
+вызова jose.jwt со строковым ключом, при котором ключ строится заново
+на каждый вызов.
+
+Запуск из каталога service:
+    python benchmarks/token_codec.py [--number N]
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from common import setup_environment, measure
+
+setup_environment()
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519  # noqa: E402
+from jose import jwt  # noqa: E402
+
+from users.auth import TOKEN_CODECS  # noqa: E402
+
+
+SECRET_KEY = "benchmark-secret-key-of-32-bytes!"
+
+
+def generate_keys(algorithm: str) -> tuple[str | None, str | None]:
+    """Создает пару ключей PEM для асимметричного алгоритма."""
+
+    if algorithm == "HS256":
+        return None, None
+
+    if algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+
+    return private_pem, public_pem
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает результат."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    claims = {
+        "email": "bench@example.com",
+        "exp": datetime.now(timezone.utc) + timedelta(days=14)
+    }
+
+    print(f"{'backend':<10} {'algorithm':<10} {'encode/s':>12} {'decode/s':>12}")
+
+    token = jwt.encode(claims, SECRET_KEY, "HS256")
+    encode = measure(lambda: jwt.encode(claims, SECRET_KEY, "HS256"), args.number)
+    decode = measure(lambda: jwt.decode(token, SECRET_KEY, "HS256"), args.number)
+    print(f"{'jose-raw':<10} {'HS256':<10} {1e6 / encode:>12.0f} {1e6 / decode:>12.0f}")
+
+    for backend, codec_class in TOKEN_CODECS.items():
+        for algorithm in ("HS256", "ES256", "EdDSA"):
+            if algorithm not in codec_class.algorithms:
+                print(f"{backend:<10} {algorithm:<10} {'n/a':>12} {'n/a':>12}")
+                continue
+
+            private_key, public_key = generate_keys(algorithm)
+            codec = codec_class(
+                algorithm,
+                secret_key=SECRET_KEY,
+                private_key=private_key,
+                public_key=public_key
+            )
+            token = codec.encode(claims)
+
+            encode = measure(lambda: codec.encode(claims), args.number)
+            decode = measure(lambda: codec.decode(token), args.number)
+            print(
+                f"{backend:<10} {algorithm:<10} "
+                f"{1e6 / encode:>12.0f} {1e6 / decode:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
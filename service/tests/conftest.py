@@ -0,0 +1,99 @@
+"""
+Общие фикстуры тестов.
+
+Тесты работают без Postgres: база данных - отдельный файл SQLite
+(aiosqlite) во временном каталоге каждого теста.
+
+Запуск из каталога service:
+    python -m pytest
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+from cache import lookup_flight, principal_cache, token_cache  # noqa: E402
+from dao.dao_models import UsersDAO  # noqa: E402
+from database import create_tables, dispose_engines  # noqa: E402
+from database import get_engine, get_replica_engines  # noqa: E402
+from database import get_session_maker  # noqa: E402
+from database import get_replica_session_makers, get_settings  # noqa: E402
+from migration.models import Base  # noqa: E402
+from users.auth import token_codec  # noqa: E402
+from users.hashing import hashing_engine, pwd_context  # noqa: E402
+from users.limiter import rate_limiter  # noqa: E402
+from users.revocation import revocation_store  # noqa: E402
+
+
+def reset_app_state() -> None:
+    """
+    Сбрасывает настройки, движки и общие объекты приложения.
+
+    Они создаются при первом обращении и затем живут до конца процесса,
+    поэтому без сброса следующий тест получил бы базу и настройки
+    предыдущего.
+    """
+
+    for getter in (
+        get_settings, get_engine, get_replica_engines,
+        get_session_maker, get_replica_session_makers
+    ):
+        getter.cache_clear()
+
+    for lazy in (
+        principal_cache, token_cache, lookup_flight, token_codec,
+        pwd_context, hashing_engine, rate_limiter, revocation_store
+    ):
+        object.__setattr__(lazy, "_instance", None)
+
+    UsersDAO._has_users = False
+
+
+@pytest.fixture
+def environment(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Задает переменные окружения приложения с базой SQLite.
+
+    Тест может изменить переменные через monkeypatch до первого
+    обращения к настройкам.
+
+    Returns:
+        Временной каталог теста, в котором лежит база данных.
+    """
+
+    monkeypatch.setenv(
+        "DB_URL",
+        f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    )
+    monkeypatch.delenv("DB_REPLICA_URLS", raising=False)
+    monkeypatch.setenv("SECRET_KEY", "test-secret-key")
+    monkeypatch.setenv("ALGORITHM", "HS256")
+    monkeypatch.setenv("HASH_COST", "4")
+    monkeypatch.setenv("HASH_WORKERS", "1")
+    monkeypatch.setenv("RATE_LIMIT_IP", "0/60")
+    monkeypatch.setenv("RATE_LIMIT_EMAIL", "0/60")
+
+    reset_app_state()
+    yield tmp_path
+    reset_app_state()
+
+
+@pytest.fixture
+async def database(environment: Path) -> Path:
+    """
+    Создает таблицы в базе теста и закрывает соединения после теста.
+
+    Returns:
+        Временной каталог теста.
+    """
+
+    await create_tables(Base.metadata)
+    yield environment
+    await dispose_engines()
@@ -0,0 +1,94 @@
+"""
+Выбор первого администратора при параллельных регистрациях
+в нескольких процессах.
+
+На SQLite записи и так выполняются по очереди, поэтому гонку по-
+настоящему проверяет только Postgres: задайте TEST_POSTGRES_URL
+(postgresql+asyncpg://...) с пустой тестовой базой, иначе этот вариант
+пропускается. Таблицы в ней пересоздаются.
+"""
+
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+from sqlalchemy import select, func
+
+from database import create_tables, dispose_engines, get_engine
+from database import session_maker
+from dao.dao_models import UsersDAO
+from migration.models import Base, Users
+
+
+PROCESSES = 4
+USERS = 10
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+async def register_many(method: str, process: int, users: int) -> None:
+    """Параллельно регистрирует пользователей в одном процессе."""
+
+    await asyncio.gather(*(
+        getattr(UsersDAO, method)(
+            name="Bootstrap",
+            email=f"bootstrap-{process}-{number}@example.com",
+            password="not-a-real-hash",
+            surname="Bootstrap",
+            middle_name="Bootstrap"
+        )
+        for number in range(users)
+    ))
+    await get_engine().dispose()
+
+
+def run_process(method: str, process: int, users: int) -> None:
+    """Точка входа дочернего процесса."""
+
+    asyncio.run(register_many(method, process, users))
+
+
+@pytest.fixture(params=[
+    "sqlite",
+    pytest.param(
+        "postgresql",
+        marks=pytest.mark.skipif(
+            POSTGRES_URL is None,
+            reason="TEST_POSTGRES_URL не задан"
+        )
+    )
+])
+async def empty_database(request, environment, monkeypatch):
+    """Создает пустую таблицу users в SQLite или в Postgres."""
+
+    if request.param == "postgresql":
+        monkeypatch.setenv("DB_URL", POSTGRES_URL)
+        async with get_engine().begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+
+    await create_tables(Base.metadata)
+    yield
+    await dispose_engines()
+
+
+@pytest.mark.parametrize("method", ["add_user", "upsert_user"])
+async def test_single_admin_across_processes(empty_database, method):
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_process, args=(method, number, USERS))
+        for number in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        await asyncio.to_thread(process.join)
+
+    async with session_maker() as session:
+        result = await session.execute(
+            select(Users.role, func.count(Users.id)).group_by(Users.role)
+        )
+        roles = dict(result.all())
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert roles.get("admin") == 1
+    assert sum(roles.values()) == PROCESSES * USERS
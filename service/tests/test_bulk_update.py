@@ -0,0 +1,40 @@
+"""Массовое изменение пользователей не трогает уже совпадающие строки."""
+
+from dao.dao_models import UsersDAO
+
+
+async def add_users(*emails: str) -> None:
+    """Регистрирует пользователей через upsert_user."""
+
+    for email in emails:
+        await UsersDAO.upsert_user(
+            name="Bulk",
+            email=email,
+            password="not-a-real-hash",
+            surname="Bulk",
+            middle_name="Bulk"
+        )
+
+
+async def test_skips_rows_that_already_match(database):
+    await add_users("a@example.com", "b@example.com")
+    await UsersDAO.bulk_update(
+        {"is_active": False},
+        chunk_size=10,
+        emails=["a@example.com"]
+    )
+    before = await UsersDAO.find_principal("b@example.com")
+
+    emails = ["a@example.com", "b@example.com"]
+    ids = await UsersDAO.bulk_update(
+        {"is_active": False},
+        chunk_size=10,
+        emails=emails
+    )
+    repeated = await UsersDAO.bulk_update(
+        {"is_active": False},
+        chunk_size=1
+    )
+
+    assert ids == [before.id]
+    assert repeated == []
@@ -0,0 +1,87 @@
+"""
+Поиск пользователя по почте: индекс lower(email) и независимость
+от регистра.
+"""
+
+import pytest
+
+from database import get_engine
+from dao.dao_models import UsersDAO
+
+
+INDEX = "ix_users_email_lower"
+EMAIL = "Index.Check@Example.com"
+
+
+def email_statements() -> dict[str, tuple[object, dict]]:
+    """Собирает запросы UsersDAO по почте и их параметры."""
+
+    email = UsersDAO._normalize_email(EMAIL)
+    return {
+        "find_user": (UsersDAO._select_by_email, {"email": email}),
+        "find_principal": (UsersDAO._select_principal, {"email": email}),
+        "find_credentials": (UsersDAO._select_credentials, {"email": email}),
+        "delete_user": (UsersDAO._deactivate, {"user_email": email}),
+        "update_user": (
+            UsersDAO._update_by_email(frozenset({"name"}), True),
+            {"user_email": email, "new_name": "Index"}
+        )
+    }
+
+
+async def explain(statement, params: dict) -> str:
+    """
+    Выполняет EXPLAIN QUERY PLAN запроса.
+
+    Args:
+        statement: запрос SQLAlchemy.
+        params: значения параметров запроса.
+
+    Returns:
+        План запроса одной строкой.
+    """
+
+    engine = get_engine()
+    compiled = statement.compile(dialect=engine.dialect)
+    values = compiled.construct_params(params)
+    if compiled.positional:
+        values = tuple(values[name] for name in compiled.positiontup)
+
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + compiled.string,
+            values
+        )
+        plan = " ".join(str(value) for row in result for value in row)
+        await connection.rollback()
+
+    return plan
+
+
+async def add_user(email: str):
+    """Регистрирует пользователя через upsert_user."""
+
+    return await UsersDAO.upsert_user(
+        name="Index",
+        email=email,
+        password="not-a-real-hash",
+        surname="Index",
+        middle_name="Index"
+    )
+
+
+@pytest.mark.parametrize("name", email_statements())
+async def test_email_lookup_uses_index(database, name):
+    statement, params = email_statements()[name]
+
+    assert INDEX in await explain(statement, params)
+
+
+async def test_email_is_case_insensitive(database):
+    user, _ = await add_user(EMAIL)
+    duplicate, _ = await add_user(EMAIL.upper())
+    found = await UsersDAO.find_user(email=EMAIL.swapcase())
+
+    assert user.email == EMAIL.lower()
+    assert duplicate is None
+    assert found is not None and found.id == user.id
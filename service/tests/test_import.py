@@ -0,0 +1,57 @@
+"""
+Импорт приложения: время импорта и отсутствие побочных эффектов.
+
+Бюджет времени импорта тот же, что в benchmarks/import_time.py, но с
+запасом для медленных машин CI. Его можно задать переменной
+IMPORT_TIME_BUDGET_MS.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 1500 * 2))
+
+# Выполняется в дочернем процессе, чтобы импорт был первым
+CHECK_SIDE_EFFECTS = """
+import main
+from database import get_settings, get_engine
+print(get_settings.cache_info().currsize, get_engine.cache_info().currsize)
+"""
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    """Запускает python в каталоге app в отдельном процессе."""
+
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def test_import_has_no_side_effects(environment):
+    process = run_python("-c", CHECK_SIDE_EFFECTS)
+    settings_loaded, engine_created = process.stdout.split()
+
+    assert settings_loaded == "0"
+    assert engine_created == "0"
+
+
+def test_import_time_within_budget(environment):
+    process = run_python("-X", "importtime", "-c", "import main")
+
+    # Строка вида "import time: self | cumulative | main"
+    cumulative = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, us, name = line.split("|")
+        cumulative[name.strip()] = int(us)
+
+    assert cumulative["main"] / 1000 < BUDGET_MS
@@ -0,0 +1,55 @@
+"""Токен обновления одноразовый, в том числе при одновременных запросах."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from main import app, lifespan
+
+
+USER = {
+    "email": "refresh@example.com",
+    "name": "Refresh",
+    "surname": "Refresh",
+    "middle_name": "Refresh",
+    "password": "refresh-password",
+    "confirm_password": "refresh-password"
+}
+
+
+@pytest.fixture(params=["database", "memory"])
+async def client(request, environment, monkeypatch):
+    """Запускает приложение в режиме без состояния."""
+
+    monkeypatch.setenv("TOKEN_STATELESS", "true")
+    monkeypatch.setenv("REVOCATION_BACKEND", request.param)
+
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app):
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://refresh"
+        ) as client:
+            yield client
+
+
+async def refresh(client: httpx.AsyncClient, token: str) -> int:
+    """Обновляет токены по токену обновления и возвращает код."""
+
+    response = await client.post(
+        "/auth/refresh/",
+        headers={"Cookie": f"users_refresh_token={token}"}
+    )
+    return response.status_code
+
+
+async def test_concurrent_refresh_issues_one_pair(client):
+    response = await client.post("/auth/register/", json=USER)
+    token = response.cookies["users_refresh_token"]
+    client.cookies.clear()
+
+    statuses = await asyncio.gather(*(refresh(client, token) for _ in range(5)))
+
+    assert sorted(statuses) == [200, 401, 401, 401, 401]
+    assert await refresh(client, token) == 401
@@ -0,0 +1,79 @@
+"""
+Чтение с реплик и правило read-your-writes.
+
+Основная база и реплика - два отдельных файла SQLite без репликации
+между ними, поэтому по результату чтения видно, в какую базу оно ушло:
+пользователь есть только в основной базе.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from database import get_pool_stats
+from main import app, lifespan
+
+
+WINDOW = 1.0
+USER = {
+    "email": "replica@example.com",
+    "name": "Replica",
+    "surname": "Replica",
+    "middle_name": "Replica",
+    "password": "replica-password",
+    "confirm_password": "replica-password"
+}
+CREDENTIALS = {"email": USER["email"], "password": USER["password"]}
+
+
+@pytest.fixture
+async def clients(environment, monkeypatch):
+    """
+    Запускает приложение с репликой и возвращает двух клиентов.
+
+    Returns:
+        Клиенты A и B с отдельными cookie.
+    """
+
+    monkeypatch.setenv(
+        "DB_REPLICA_URLS",
+        f"sqlite+aiosqlite:///{environment / 'replica.db'}"
+    )
+    monkeypatch.setenv("DB_READ_YOUR_WRITES_WINDOW", str(WINDOW))
+
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app):
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://replica"
+        ) as client_a, httpx.AsyncClient(
+            transport=transport,
+            base_url="http://replica"
+        ) as client_b:
+            yield client_a, client_b
+
+
+async def login(client: httpx.AsyncClient) -> int:
+    """Входит под пользователем без токена доступа и возвращает код."""
+
+    client.cookies.delete("users_access_token")
+    response = await client.post("/auth/login/", json=CREDENTIALS)
+    return response.status_code
+
+
+async def test_read_your_writes(clients):
+    client_a, client_b = clients
+
+    response = await client_a.post("/auth/register/", json=USER)
+    assert "db_primary_until" in response.cookies
+
+    # A читает свою запись из основной базы, B - из пустой реплики
+    assert await login(client_a) == 200
+    assert await login(client_b) == 401
+
+    # После окна A тоже читает из реплики
+    await asyncio.sleep(WINDOW + 0.1)
+    assert await login(client_a) == 401
+
+    assert get_pool_stats()["replicas"][0]["checkouts"] > 0
@@ -0,0 +1,35 @@
+"""Список отозванных токенов с локальным хранилищем."""
+
+from time import time
+
+from users.revocation import MemoryBackend, RevocationStore
+
+
+async def test_memory_backend_purges_expired_tokens():
+    backend = MemoryBackend()
+    store = RevocationStore(backend, bloom_bits=1024, purge_interval=0)
+    now = int(time())
+
+    await store.revoke("expired", now - 1)
+    await store.revoke("active", now + 60)
+    await store.sync()
+
+    assert set(backend._tokens) == {"active"}
+    assert set(store._tokens) == {"active"}
+    assert store.is_revoked("active")
+    assert not store.is_revoked("expired")
+
+
+async def test_memory_backend_cursor_survives_purge():
+    backend = MemoryBackend()
+    writer = RevocationStore(backend, purge_interval=0)
+    reader = RevocationStore(backend)
+    now = int(time())
+
+    await writer.revoke("expired", now - 1)
+    await writer.sync()
+    await reader.sync()
+    await writer.revoke("later", now + 60)
+    await reader.sync()
+
+    assert reader.is_revoked("later")